@@ -1,13 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from app.services.audio_video_service import AudioVideoService
+from app.services.job_service import FusionJobQueue, FINISHED_STATUSES
 from app.schemas.audio_video_schema import AudioVideoResponse
 from typing import Dict, Any
 from pathlib import Path
+import json
+import os
 import uuid
 
 from app.core.config import settings
-from app.utils.video_utils import convert_flv_to_mp4, is_ffmpeg_available
+from app.utils.upload_utils import spool_upload
+from app.utils.video_utils import convert_to_mp4_async, is_ffmpeg_available
 
 router = APIRouter()
 
@@ -23,8 +28,29 @@ def get_audio_video_service() -> AudioVideoService:
     return audio_video_service
 
 
+async def _run_fusion_job(file_path: str, filename: str) -> Dict[str, Any]:
+    return await get_audio_video_service().predict_file(file_path, filename)
+
+
+# Local worker pool cho /jobs (start/stop trong app.main)
+job_queue = FusionJobQueue(_run_fusion_job)
+
+
+def _public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if k != "file_path"}
+
+
 @router.post("/predict", response_model=AudioVideoResponse)
-async def predict_audio_video(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def predict_audio_video(
+    file: UploadFile = File(...),
+    timeline: bool = Query(False, description="Long-video mode: stream an emotion timeline over 3.2s windows (NDJSON)"),
+    hop_s: float = Query(
+        None,
+        ge=settings.FUSION_TIMELINE_MIN_HOP_S,
+        description="Timeline window hop in seconds (default 3.2 = no overlap)",
+    ),
+    detector: str = Query(None, description="Face detector: haar | mtcnn (default from settings)"),
+) -> Dict[str, Any]:
     """
     Predict emotion từ video file (audio + visual fusion)
     
@@ -37,23 +63,60 @@ async def predict_audio_video(file: UploadFile = File(...)) -> Dict[str, Any]:
     
     Parameters:
     - file: Video file (MP4, WebM, FLV, etc.)
+    - detector: Face detector backend (haar = fast, mtcnn = higher recall)
     
     Returns:
     - emotion: Predicted emotion (ANG, DIS, FEA, HAP, NEU, SAD)
     - confidence: Confidence score (0..1)
     - all_emotions: Probability scores cho tất cả cảm xúc
+
+    Nếu timeline=True, response là NDJSON stream: 1 event "start", mỗi cửa sổ
+    3.2s một event "window" (start, end, emotion, confidence, all_emotions)
+    ngay khi batch của nó xong, và event "end" chứa kết quả tổng hợp.
     """
     svc = get_audio_video_service()
-    result = await svc.predict(file)
+    if timeline:
+        events, cleanup = await svc.predict_timeline(file, hop_s=hop_s, detector=detector)
+        return StreamingResponse(
+            (json.dumps(event, ensure_ascii=False) + "\n" async for event in events),
+            media_type="application/x-ndjson",
+            # xóa file tạm cả khi client ngắt trước khi generator chạy (finally của nó không chạy)
+            background=BackgroundTask(cleanup),
+        )
+    result = await svc.predict(file, detector=detector)
     return JSONResponse(content=result)
 
 
+def _publish_content_file(tmp_path: Path, target: Path) -> None:
+    """
+    Đưa file tạm vào tên content-addressed. Cùng tên = cùng nội dung, nên nếu target đã có
+    thì giữ bản cũ (không ghi đè file request khác đang đọc — trên Windows os.replace lên
+    file đang mở bị PermissionError) và bỏ file tạm.
+    """
+    if not target.exists():
+        try:
+            os.replace(tmp_path, target)
+            return
+        except PermissionError:
+            pass  # request khác vừa publish và đang mở target
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+    try:
+        os.utime(target)  # giữ target khỏi file lifecycle sweep
+    except OSError:
+        pass
+
+
 @router.post("/convert")
 async def convert_video_to_mp4(file: UploadFile = File(...)) -> Dict[str, str]:
     """Convert an uploaded FLV (or other) video to MP4 for frontend display.
 
-    - Saves the original upload to `settings.UPLOAD_DIR` with a unique name.
-    - Converts to MP4 using ffmpeg and saves next to the original file.
+    - Saves the original upload to `settings.UPLOAD_DIR`, named by its SHA-256.
+    - If an MP4 for the same content already exists, returns it (conversion cache).
+    - Otherwise remuxes (stream copy, when already H.264/AAC) or re-encodes to MP4
+      with an async ffmpeg process and saves it next to the original file.
     - Returns the public URL path to the MP4 (mounted under `/static`).
 
     Note: This endpoint keeps the original file (so model can still use FLV if desired).
@@ -65,36 +128,105 @@ async def convert_video_to_mp4(file: UploadFile = File(...)) -> Dict[str, str]:
     uploads_dir: Path = settings.UPLOAD_DIR
     uploads_dir.mkdir(parents=True, exist_ok=True)
 
-    # Generate unique base name
-    unique = uuid.uuid4().hex
+    # Save original (streamed in chunks, size-limited) under a temporary unique name
     orig_suffix = Path(file.filename).suffix or ".flv"
-    orig_name = f"{unique}{orig_suffix}"
-    orig_path = uploads_dir / orig_name
+    part_path = uploads_dir / f"{uuid.uuid4().hex}{orig_suffix}.part"
+    saved = await spool_upload(file, settings.MAX_VIDEO_UPLOAD_SIZE, dest=part_path)
 
-    # Save original
-    try:
-        contents = await file.read()
-        with open(orig_path, "wb") as f:
-            f.write(contents)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save uploaded file: {e}")
+    # Content-addressed names: same bytes -> same original + MP4
+    content_id = saved.sha256[:32]
+    orig_name = f"{content_id}{orig_suffix}"
+    orig_path = uploads_dir / orig_name
+    _publish_content_file(part_path, orig_path)
 
-    # Build output mp4 path
-    out_name = f"{unique}.mp4"
+    out_name = f"{content_id}.mp4"
     out_path = uploads_dir / out_name
+    mp4_url = f"/static/uploads/{out_name}"
+    orig_url = f"/static/uploads/{orig_name}"
 
-    # Convert using ffmpeg
     try:
-        convert_flv_to_mp4(str(orig_path), str(out_path))
+        # Cache hit: cập nhật mtime để file lifecycle sweep không xóa MP4 vừa trả về
+        os.utime(out_path)
+        return JSONResponse(content={"mp4_url": mp4_url, "original_url": orig_url, "cached": True})
+    except FileNotFoundError:
+        pass
+
+    # Convert using ffmpeg into a temp name, then publish atomically
+    tmp_out = uploads_dir / f"{content_id}.{uuid.uuid4().hex}.mp4.part"
+    try:
+        mode = await convert_to_mp4_async(str(orig_path), str(tmp_out))
+        _publish_content_file(tmp_out, out_path)
     except Exception as e:
+        try:
+            os.remove(tmp_out)
+        except Exception:
+            pass
         # keep original for inspection
         raise HTTPException(status_code=500, detail=f"Conversion failed: {e}")
 
-    # Return URL relative to static mount
-    mp4_url = f"/static/uploads/{out_name}"
-    orig_url = f"/static/uploads/{orig_name}"
+    return JSONResponse(
+        content={"mp4_url": mp4_url, "original_url": orig_url, "cached": False, "mode": mode}
+    )
+
 
-    return JSONResponse(content={"mp4_url": mp4_url, "original_url": orig_url})
+@router.post("/jobs", status_code=202)
+async def submit_fusion_job(file: UploadFile = File(...)) -> Dict[str, Any]:
+    """
+    Submit video để phân tích bất đồng bộ (audio + visual fusion).
+
+    Returns ngay lập tức:
+    - job_id: dùng cho GET /audio-video/jobs/{job_id} hoặc /jobs/{job_id}/events
+    - status: "queued"
+
+    429 nếu hàng đợi đã đầy (FUSION_JOB_QUEUE_LIMIT).
+    """
+    job = await job_queue.submit(file)
+    return JSONResponse(status_code=202, content=_public_job(job))
+
+
+@router.get("/jobs/{job_id}")
+async def get_fusion_job(job_id: str) -> Dict[str, Any]:
+    """
+    Poll trạng thái job: queued | running | done | failed.
+    Khi done, `result` chứa emotion, confidence, all_emotions, analysis_id.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=_public_job(job))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_fusion_job(job_id: str):
+    """
+    Server-Sent Events: gửi event `status` mỗi khi job đổi trạng thái,
+    kết thúc stream khi job done/failed.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last_status = None
+        while True:
+            job = await job_queue.get(job_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {json.dumps(_public_job(job), ensure_ascii=False)}\n\n"
+            else:
+                # heartbeat để proxy không đóng kết nối
+                yield ": keep-alive\n\n"
+            if last_status in FINISHED_STATUSES:
+                return
+            await job_queue.wait_for_update(job_id, timeout=15)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/health")
@@ -2,7 +2,7 @@ from fastapi import APIRouter, UploadFile, File, Query
 from fastapi.responses import JSONResponse
 from app.services.face_service import FaceService
 from app.schemas.face_schema import FaceDetectResponse
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 router = APIRouter()
 # Lazily create FaceService to avoid heavy model load at import/startup
@@ -17,7 +17,8 @@ def get_face_service() -> FaceService:
 @router.post("/detect", response_model=FaceDetectResponse)
 async def detect_faces(
     file: UploadFile = File(...),
-    include_cropped: bool = Query(False, description="Include base64 encoded cropped faces in response")
+    include_cropped: bool = Query(False, description="Include base64 encoded cropped faces in response"),
+    detector: Optional[str] = Query(None, description="Face detector: haar | mtcnn (default from settings)")
 ) -> Dict[str, Any]:
     """
     Detect all faces in uploaded image.
@@ -28,6 +29,7 @@ async def detect_faces(
     Parameters:
     - file: Image file to detect faces in
     - include_cropped: If True, include base64 encoded cropped faces in response
+    - detector: Face detector backend (haar = fast, mtcnn = higher recall)
     
     Returns:
     - faces: List of detected faces with locations
@@ -36,14 +38,15 @@ async def detect_faces(
     - image_height: Height of original image
     """
     svc = get_face_service()
-    result = await svc.detect_faces(file, include_cropped_base64=include_cropped)
+    result = await svc.detect_faces(file, include_cropped_base64=include_cropped, detector=detector)
     return JSONResponse(content=result)
 
 @router.post("/predict")
 async def predict_emotion(
     file: UploadFile = File(...), 
     skip_save: bool = Query(False, description="Skip saving result image"),
-    is_cropped_face: bool = Query(False, description="If True, treat input as already cropped face")
+    is_cropped_face: bool = Query(False, description="If True, treat input as already cropped face"),
+    detector: Optional[str] = Query(None, description="Face detector: haar | mtcnn (default from settings)")
 ) -> Dict[str, Any]:
     """
     Predict emotion from face image.
@@ -58,6 +61,7 @@ async def predict_emotion(
     - file: Image file to analyze (full image or cropped face)
     - skip_save: If True, skip saving result image (for realtime mode)
     - is_cropped_face: If True, treat input as already cropped face
+    - detector: Face detector backend (ignored if is_cropped_face=True)
 
     Returns:
     - emotion: Predicted emotion
@@ -74,7 +78,7 @@ async def predict_emotion(
         return JSONResponse(content=result)
     else:
         # Legacy mode: detect and predict
-        result = await svc.predict_emotion(file, skip_save=skip_save)
+        result = await svc.predict_emotion(file, skip_save=skip_save, detector=detector)
         return JSONResponse(content=result)
 
 @router.post("/predict-batch")
@@ -1,153 +1,413 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
-from datetime import datetime, date
-from typing import Dict, Any, List
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from datetime import datetime, date, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Any, Optional
 from sqlalchemy import select, and_, func
-from app.core.db import engine, results_table
+from app.core.config import settings
+from app.core.cache import ResponseCache
+from app.core.result_events import result_events
+from app.core.db import engine, results_table, results_stats_table, run_db, current_results_version
 from app.core.logger import setup_logger
-import json
+from app.services.results_service import (
+    ResultFilters,
+    query_page,
+    query_timeline,
+    day_range,
+    ITEM_COLUMNS,
+    row_to_item,
+    set_trash_where_sync,
+    delete_where_sync,
+)
+from app.schemas.results_schema import BulkResultsRequest, BulkResultsResponse
+from app.services.archive_service import archive_where_sync
+from app.utils.response_utils import (
+    FORMAT_MEDIA_TYPES,
+    columnar_content,
+    encode_content,
+    negotiate_format,
+)
+from app.services.export_service import EXPORT_FORMATS, check_export_format, stream_export
 
 logger = setup_logger(__name__)
 
 router = APIRouter()
 
 
+# Các truy vấn chạy đồng bộ trên DB thread pool (run_db), không block event loop
+
+def _limited(stmt, limit: int | None):
+    return stmt.limit(min(limit, settings.RESULTS_PAGE_MAX_LIMIT)) if limit else stmt
+
+
+LIMIT_QUERY = Query(None, ge=1, description="Max number of rows (newest first); default = all")
+
+# Response đã serialize, key = (URL, version của bảng results)
+response_cache = ResponseCache(settings.RESULTS_RESPONSE_CACHE_ITEMS)
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag[2:] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def _render(build, args: tuple, fmt: str, columnar: bool):
+    """
+    Returns:
+        body đã serialize, hoặc Response lỗi (406) nếu format không áp dụng được
+    """
+    content = await build(*args)
+    list_key = None
+    if columnar:
+        content, list_key = columnar_content(content)
+    if fmt == "arrow" and list_key is None:
+        return JSONResponse(status_code=406, content={"detail": "Arrow is only available for result lists"})
+    return encode_content(content, fmt, list_key)
+
+
+async def _conditional_response(request: Request, build, *args, conditional: bool = True) -> Response:
+    """
+    GET có điều kiện theo version của bảng results:
+    - If-None-Match / If-Modified-Since khớp -> 304, không truy vấn DB
+    - cùng (format, URL) + version đã có trong response_cache -> trả body đã serialize
+    - còn lại: await build(*args), serialize và cache
+    conditional=False: body phụ thuộc thời điểm request (vd. cận mặc định = now) nên không
+    ETag / 304 / cache, chỉ negotiate format.
+
+    Format theo header Accept: JSON (mặc định), MessagePack, Arrow IPC stream.
+    ?layout=columnar (luôn bật với MessagePack / Arrow): list result thành các mảng
+    song song theo cột + `labels` / ma trận `probabilities` thay cho all_emotions.
+    """
+    fmt = negotiate_format(request.headers.get("accept"))
+    if fmt is None:
+        return JSONResponse(
+            status_code=406,
+            content={"detail": f"Acceptable: {', '.join(FORMAT_MEDIA_TYPES.values())}"},
+        )
+    layout = request.query_params.get("layout", "rows")
+    if layout not in ("rows", "columnar"):
+        return JSONResponse(status_code=400, content={"detail": "Invalid layout. Must be one of: rows, columnar"})
+    columnar = layout == "columnar" or fmt != "json"
+
+    if not conditional:
+        body = await _render(build, args, fmt, columnar)
+        if isinstance(body, Response):
+            return body
+        return Response(
+            content=body,
+            media_type=FORMAT_MEDIA_TYPES[fmt],
+            headers={"Cache-Control": "no-store", "Vary": "Accept"},
+        )
+
+    version, updated_at = await current_results_version()
+    etag = f'W/"results-{version}"' if fmt == "json" else f'W/"results-{version}-{fmt}"'
+    last_modified = updated_at.astimezone(timezone.utc) if updated_at is not None else None
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    key = f"{fmt} {request.url}"
+    body = response_cache.get(key, version)
+    if body is None:
+        body = await _render(build, args, fmt, columnar)
+        if isinstance(body, Response):
+            return body
+        response_cache.put(key, version, body)
+    return Response(content=body, media_type=FORMAT_MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.get("/query")
+async def query_results(
+    request: Request,
+    source: Optional[str] = Query(None, description="face | audio | audio_video | ..."),
+    trash: Optional[int] = Query(0, ge=0, le=1, description="0 = active (default), 1 = trash"),
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound (ISO 8601)"),
+    emotion: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (capped by RESULTS_PAGE_MAX_LIMIT)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+) -> Dict[str, Any]:
+    """
+    Filtered results, newest first, keyset-paginated on (timestamp, id).
+
+    Returns:
+    {
+        "results": [{id, source, timestamp, emotion, confidence, all_emotions, trash}],
+        "count": int,
+        "next_cursor": str | null   # truyền lại qua ?cursor= để lấy trang tiếp
+    }
+    """
+    filters = ResultFilters(source=source, trash=trash, start=start, end=end, emotion=emotion)
+    return await _conditional_response(request, query_page, filters, limit, cursor)
+
+
+@router.get("/timeline")
+async def get_results_timeline(
+    request: Request,
+    bucket: str = Query("hour", description="minute | hour | day"),
+    source: Optional[str] = Query(None),
+    trash: Optional[int] = Query(0, ge=0, le=1),
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound (ISO 8601)"),
+    emotion: Optional[str] = Query(None),
+) -> Dict[str, Any]:
+    """
+    Count và mean confidence mỗi emotion theo bucket thời gian, tính bằng GROUP BY trong SQL
+    (dùng cho TimelineCard / DistributionCard thay vì gửi toàn bộ row).
+
+    Returns:
+    {
+        "bucket": "hour",
+        "start": str, "end": str,   # range đã áp dụng; thiếu cận -> RESULTS_TIMELINE_MAX_BUCKETS bucket
+        "timeline": [
+            {"time": str, "count": int, "emotions": {"happy": {"count": int, "mean_confidence": float}, ...}}
+        ]
+    }
+    """
+    filters = ResultFilters(source=source, trash=trash, start=start, end=end, emotion=emotion)
+    # Thiếu cả 2 cận -> end = now: không cache / 304 theo version
+    return await _conditional_response(
+        request, query_timeline, filters, bucket, conditional=start is not None or end is not None
+    )
+
+
+@router.get("/events")
+async def stream_result_events(
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id (same as Last-Event-ID header)"),
+):
+    """
+    Server-Sent Events: live feed thay đổi của results trong process này.
+    - event `new`: item mới (cùng dạng item của /results/query)
+    - event `trash` / `restore` / `delete`: {"ids": [...] | null, "count": int}, ids = null -> refetch
+    - event `reset`: không resume được (restart / client quá chậm), client phải refetch toàn bộ
+    Reconnect với header Last-Event-ID (EventSource tự gửi) để nhận lại event bị lỡ.
+    """
+    resume = request.headers.get("last-event-id") or last_event_id
+
+    async def events():
+        seq = result_events.resume_from(resume)
+        if seq is None:
+            seq = result_events.resume_from(None)
+            yield f"id: {result_events.event_id(seq)}\nevent: reset\ndata: {{}}\n\n"
+        while True:
+            waiter = result_events.waiter()
+            pending = result_events.since(seq)
+            if pending is None:
+                seq = result_events.resume_from(None)
+                yield f"id: {result_events.event_id(seq)}\nevent: reset\ndata: {{}}\n\n"
+                continue
+            if pending:
+                chunk = []
+                for seq, event_type, data in pending:
+                    chunk.append(f"id: {result_events.event_id(seq)}\nevent: {event_type}\ndata: {data}\n\n")
+                yield "".join(chunk)
+            else:
+                # heartbeat để proxy không đóng kết nối
+                yield ": keep-alive\n\n"
+            await result_events.wait(waiter, settings.RESULTS_EVENTS_HEARTBEAT_S)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/export")
+async def export_results(
+    fmt: str = Query("ndjson", alias="format", description="ndjson | csv | parquet"),
+    source: Optional[str] = Query(None),
+    trash: Optional[int] = Query(
+        None, ge=0, le=1, description="0 / 1; default 0, or both when archived=true"
+    ),
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound (ISO 8601)"),
+    emotion: Optional[str] = Query(None),
+    archived: bool = Query(False, description="Read archived results (results_archive) instead"),
+):
+    """
+    Stream toàn bộ result khớp bộ lọc (giống /results/query), cũ nhất trước.
+    Đọc bằng server-side cursor theo chunk RESULTS_EXPORT_CHUNK row; parquet: mỗi chunk 1 row group.
+    archived=true: result đã được archive (cũ hơn RESULTS_ARCHIVE_AFTER_DAYS / trash đã empty);
+    khi đó không truyền trash = lấy cả row active lẫn trash.
+    """
+    check_export_format(fmt)
+    if trash is None and not archived:
+        trash = 0
+    filters = ResultFilters(source=source, trash=trash, start=start, end=end, emotion=emotion)
+    media_type, ext = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        stream_export(filters, fmt, archived),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="results.{ext}"'},
+    )
+
+
+def _get_all_results_sync(limit: int | None = None) -> Dict[str, Any]:
+    with engine.begin() as conn:
+        stmt = select(*ITEM_COLUMNS).where(results_table.c.trash == 0).order_by(results_table.c.timestamp.desc())
+        stmt = _limited(stmt, limit)
+        rows = conn.execute(stmt).fetchall()
+    all_results = []
+    source_counts = {"face": 0, "audio": 0, "fusion_video_audio": 0}
+    for row in rows:
+        try:
+            result_item = row_to_item(row)
+            all_results.append(result_item)
+            if row.source in source_counts:
+                source_counts[row.source] += 1
+        except Exception as e:
+            logger.warning(f"Error parsing result row {row.id}: {e}")
+            continue
+    return {
+        "all_results": all_results,
+        "count": len(all_results),
+        "sources": source_counts
+    }
+
+
 @router.get("/all")
-async def get_all_results() -> Dict[str, Any]:
+async def get_all_results(request: Request, limit: Optional[int] = LIMIT_QUERY) -> Dict[str, Any]:
     """
     Get all results from all sources (vision/face, audio, fusion_video_audio)
     Used for Dashboard display
     """
     try:
-        with engine.begin() as conn:
-            stmt = select(results_table).where(results_table.c.trash == 0).order_by(results_table.c.timestamp.desc())
-            rows = conn.execute(stmt).fetchall()
-            all_results = []
-            source_counts = {"face": 0, "audio": 0, "fusion_video_audio": 0}
-            for row in rows:
-                try:
-                    payload = json.loads(row.payload)
-                    result_item = {
-                        "id": row.id,
-                        "source": row.source,
-                        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
-                        "emotion": payload.get("emotion"),
-                        "confidence": payload.get("confidence"),
-                        "all_emotions": payload.get("all_emotions", {}),
-                        "trash": row.trash,
-                    }
-                    all_results.append(result_item)
-                    if row.source in source_counts:
-                        source_counts[row.source] += 1
-                except Exception as e:
-                    logger.warning(f"Error parsing result row {row.id}: {e}")
-                    continue
-            return JSONResponse(content={
-                "all_results": all_results,
-                "count": len(all_results),
-                "sources": source_counts
-            })
+        return await _conditional_response(request, run_db, _get_all_results_sync, limit)
     except Exception as e:
         logger.error(f"Error fetching all results: {e}")
         return JSONResponse(status_code=500, content={"detail": str(e)})
+
+
 @router.post("/set_trash/{result_id}")
 async def set_result_trash(result_id: int) -> Dict[str, Any]:
     """
     Đánh dấu một result là trash (xóa mềm)
     """
     try:
-        with engine.begin() as conn:
-            stmt = results_table.update().where(results_table.c.id == result_id).values(trash=1)
-            conn.execute(stmt)
+        await run_db(set_trash_where_sync, results_table.c.id == result_id, 1)
         return {"success": True, "id": result_id}
     except Exception as e:
         logger.error(f"Error setting trash for result {result_id}: {e}")
         return {"success": False, "detail": str(e)}
 
+
+def _get_trash_results_sync(limit: int | None = None) -> Dict[str, Any]:
+    with engine.begin() as conn:
+        stmt = select(*ITEM_COLUMNS).where(results_table.c.trash == 1).order_by(results_table.c.timestamp.desc())
+        stmt = _limited(stmt, limit)
+        rows = conn.execute(stmt).fetchall()
+    trash_results = []
+    for row in rows:
+        try:
+            result_item = row_to_item(row)
+            trash_results.append(result_item)
+        except Exception as e:
+            logger.warning(f"Error parsing trash result row {row.id}: {e}")
+            continue
+    return {"trash_results": trash_results, "count": len(trash_results)}
+
+
 @router.get("/trash")
-async def get_trash_results() -> Dict[str, Any]:
+async def get_trash_results(request: Request, limit: Optional[int] = LIMIT_QUERY) -> Dict[str, Any]:
     """
     Lấy các result đã bị đánh dấu trash
     """
     try:
-        with engine.begin() as conn:
-            stmt = select(results_table).where(results_table.c.trash == 1).order_by(results_table.c.timestamp.desc())
-            rows = conn.execute(stmt).fetchall()
-            trash_results = []
-            for row in rows:
-                try:
-                    payload = json.loads(row.payload)
-                    result_item = {
-                        "id": row.id,
-                        "source": row.source,
-                        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
-                        "emotion": payload.get("emotion"),
-                        "confidence": payload.get("confidence"),
-                        "all_emotions": payload.get("all_emotions", {}),
-                        "trash": row.trash,
-                    }
-                    trash_results.append(result_item)
-                except Exception as e:
-                    logger.warning(f"Error parsing trash result row {row.id}: {e}")
-                    continue
-            return JSONResponse(content={"trash_results": trash_results, "count": len(trash_results)})
+        return await _conditional_response(request, run_db, _get_trash_results_sync, limit)
     except Exception as e:
         logger.error(f"Error fetching trash results: {e}")
         return JSONResponse(content={"detail": str(e)})
 
+
+def _get_results_by_date_sync(date_str: str, target_date: date, limit: int | None = None) -> Dict[str, Any]:
+    # Range nửa mở [ngày, ngày+1) thay vì CAST(timestamp AS DATE) để dùng được index
+    start, end = day_range(target_date)
+    with engine.begin() as conn:
+        stmt = select(*ITEM_COLUMNS).where(
+            *ResultFilters(trash=0, start=start, end=end).clauses()  # ← FIX 1: chỉ lấy trash=0
+        ).order_by(results_table.c.timestamp.desc())
+        stmt = _limited(stmt, limit)
+
+        rows = conn.execute(stmt).fetchall()
+
+    results = []
+    source_counts = {"face": 0, "audio": 0, "fusion_video_audio": 0}
+
+    for row in rows:
+        result_item = row_to_item(row)  # ← FIX 2: trả về trash
+        results.append(result_item)
+
+        if row.source in source_counts:
+            source_counts[row.source] += 1
+
+    return {
+        "date": date_str,
+        "results": results,
+        "count": len(results),
+        "sources": source_counts
+    }
+
+
 @router.get("/by-date")
-async def get_results_by_date(date_str: str = Query(...)):
+async def get_results_by_date(request: Request, date_str: str = Query(...), limit: Optional[int] = LIMIT_QUERY):
     try:
         target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        from sqlalchemy import cast, Date
-        
-        with engine.begin() as conn:
-            stmt = select(results_table).where(
-                cast(results_table.c.timestamp, Date) == target_date,
-                results_table.c.trash == 0  # ← FIX 1: chỉ lấy trash=0
-            ).order_by(results_table.c.timestamp.desc())
-
-            rows = conn.execute(stmt).fetchall()
-
-            results = []
-            source_counts = {"face": 0, "audio": 0, "fusion_video_audio": 0}
-
-            for row in rows:
-                payload = json.loads(row.payload)
-                result_item = {
-                    "id": row.id,
-                    "source": row.source,
-                    "timestamp": row.timestamp.isoformat() if row.timestamp else None,
-                    "emotion": payload.get("emotion"),
-                    "confidence": payload.get("confidence"),
-                    "all_emotions": payload.get("all_emotions", {}),
-                    "trash": row.trash  # ← FIX 2: trả về trash
-                }
-                results.append(result_item)
-
-                if row.source in source_counts:
-                    source_counts[row.source] += 1
-
-            return JSONResponse(content={
-                "date": date_str,
-                "results": results,
-                "count": len(results),
-                "sources": source_counts
-            })
+        return await _conditional_response(request, run_db, _get_results_by_date_sync, date_str, target_date, limit)
 
     except Exception as e:
         logger.error(f"Error fetching results for date {date_str}: {e}")
         return JSONResponse(status_code=500, content={"detail": str(e)})
 
 
+def _get_results_by_source_sync(source_name: str, limit: int | None = None) -> Dict[str, Any]:
+    with engine.begin() as conn:
+        stmt = select(*ITEM_COLUMNS).where(
+            results_table.c.source == source_name
+        ).order_by(results_table.c.timestamp.desc())
+        stmt = _limited(stmt, limit)
+
+        rows = conn.execute(stmt).fetchall()
+
+    results = []
+    for row in rows:
+        try:
+            result_item = row_to_item(row)
+            del result_item["source"], result_item["trash"]
+            results.append(result_item)
+        except Exception as e:
+            logger.warning(f"Error parsing result row {row.id}: {e}")
+            continue
+
+    return {
+        "source": source_name,
+        "results": results,
+        "count": len(results)
+    }
+
+
 @router.get("/sources/{source_name}")
-async def get_results_by_source(source_name: str) -> Dict[str, Any]:
+async def get_results_by_source(request: Request, source_name: str, limit: Optional[int] = LIMIT_QUERY) -> Dict[str, Any]:
     """
     Get results from a specific source
-    
+
     Parameters:
     - source_name: "face", "audio", or "fusion_video_audio"
-    
+    - limit: Max number of rows (newest first)
+
     Returns:
     {
         "source": str,
@@ -170,85 +430,129 @@ async def get_results_by_source(source_name: str) -> Dict[str, Any]:
                 status_code=400,
                 content={"detail": f"Invalid source. Must be one of: {', '.join(valid_sources)}"}
             )
-        
-        with engine.begin() as conn:
-            stmt = select(results_table).where(
-                results_table.c.source == source_name
-            ).order_by(results_table.c.timestamp.desc())
-            
-            rows = conn.execute(stmt).fetchall()
-            
-            results = []
-            for row in rows:
-                try:
-                    payload = json.loads(row.payload)
-                    result_item = {
-                        "id": row.id,
-                        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
-                        "emotion": payload.get("emotion"),
-                        "confidence": payload.get("confidence"),
-                        "all_emotions": payload.get("all_emotions", {}),
-                    }
-                    results.append(result_item)
-                except Exception as e:
-                    logger.warning(f"Error parsing result row {row.id}: {e}")
-                    continue
-            
-            return JSONResponse(content={
-                "source": source_name,
-                "results": results,
-                "count": len(results)
-            })
+
+        return await _conditional_response(request, run_db, _get_results_by_source_sync, source_name, limit)
     except Exception as e:
         logger.error(f"Error fetching results for source {source_name}: {e}")
         return JSONResponse(
             status_code=500,
             content={"detail": str(e)}
         )
+
+
 @router.post("/restore/{result_id}")
 async def restore_result(result_id: int):
     try:
-        with engine.begin() as conn:
-            stmt = results_table.update().where(
-                results_table.c.id == result_id
-            ).values(trash=0)
-            conn.execute(stmt)
+        await run_db(set_trash_where_sync, results_table.c.id == result_id, 0)
         return {"success": True, "id": result_id}
     except Exception as e:
         logger.error(f"Error restoring result {result_id}: {e}")
         return {"success": False, "detail": str(e)}
 
+
 @router.delete("/delete/{result_id}")
 async def delete_result_permanently(result_id: int):
     try:
-        with engine.begin() as conn:
-            stmt = results_table.delete().where(
-                results_table.c.id == result_id
-            )
-            conn.execute(stmt)
+        await run_db(delete_where_sync, results_table.c.id == result_id)
         return {"success": True, "id": result_id}
     except Exception as e:
         logger.error(f"Error deleting result {result_id}: {e}")
         return {"success": False, "detail": str(e)}
+
+
 @router.delete("/trash/empty")
 async def empty_trash():
     try:
-        with engine.begin() as conn:
-            stmt = results_table.delete().where(
-                results_table.c.trash == 1
-            )
-            conn.execute(stmt)
-        return {"success": True}
+        if settings.RESULTS_ARCHIVE_EMPTIED_TRASH:
+            affected = await run_db(archive_where_sync, results_table.c.trash == 1)
+        else:
+            affected = await run_db(delete_where_sync, results_table.c.trash == 1)
+        return {"success": True, "affected": affected}
     except Exception as e:
         logger.error(f"Error emptying trash: {e}")
         return {"success": False, "detail": str(e)}
 
 
+def _bulk_where(body: BulkResultsRequest):
+    """WHERE cho bulk action: danh sách id hoặc bộ lọc (ít nhất 1 điều kiện)"""
+    if (body.ids is None) == (body.filter is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'ids' or 'filter'")
+    if body.ids is not None:
+        if not body.ids:
+            raise HTTPException(status_code=400, detail="'ids' is empty")
+        if len(body.ids) > settings.RESULTS_BULK_MAX_IDS:
+            raise HTTPException(
+                status_code=400, detail=f"At most {settings.RESULTS_BULK_MAX_IDS} ids per request"
+            )
+        return results_table.c.id.in_(body.ids)
+    clauses = ResultFilters(**body.filter.model_dump()).clauses()
+    if not clauses:
+        raise HTTPException(status_code=400, detail="'filter' must contain at least one condition")
+    return and_(*clauses)
+
+
+@router.post("/bulk/trash", response_model=BulkResultsResponse)
+async def bulk_trash(body: BulkResultsRequest):
+    """Đánh dấu trash cho nhiều result trong 1 câu UPDATE (theo ids hoặc filter)"""
+    where = _bulk_where(body)
+    affected = await run_db(set_trash_where_sync, where, 1)
+    return {"success": True, "affected": affected}
+
+
+@router.post("/bulk/restore", response_model=BulkResultsResponse)
+async def bulk_restore(body: BulkResultsRequest):
+    """Khôi phục nhiều result khỏi trash trong 1 câu UPDATE (theo ids hoặc filter)"""
+    where = _bulk_where(body)
+    affected = await run_db(set_trash_where_sync, where, 0)
+    return {"success": True, "affected": affected}
+
+
+@router.post("/bulk/delete", response_model=BulkResultsResponse)
+async def bulk_delete(body: BulkResultsRequest):
+    """Xóa vĩnh viễn nhiều result trong 1 câu DELETE (theo ids hoặc filter)"""
+    where = _bulk_where(body)
+    affected = await run_db(delete_where_sync, where)
+    return {"success": True, "affected": affected}
+
+
+def _get_results_stats_sync() -> Dict[str, Any]:
+    # Đọc từ results_stats (cập nhật incremental), kích thước không phụ thuộc số result
+    s = results_stats_table.c
+    with engine.begin() as conn:
+        # Get count by source
+        source_stmt = select(
+            s.source,
+            func.sum(s.result_count).label("count")
+        ).group_by(s.source)
+        by_source = {
+            source: int(count)
+            for source, count in conn.execute(source_stmt).fetchall()
+            if count
+        }
+
+        # Get count by emotion
+        emotion_stmt = select(
+            s.emotion,
+            func.sum(s.result_count).label("count")
+        ).where(s.emotion != "").group_by(s.emotion)
+        by_emotion = {
+            emotion: int(count)
+            for emotion, count in conn.execute(emotion_stmt).fetchall()
+            if count
+        }
+
+    return {
+        "total_count": sum(by_source.values()),
+        "by_source": by_source,
+        "by_emotion": by_emotion
+    }
+
+
 @router.get("/stats")
-async def get_results_stats() -> Dict[str, Any]:
+async def get_results_stats(request: Request) -> Dict[str, Any]:
     """
     Get statistics about results
-    
+
     Returns:
     {
         "total_count": int,
@@ -265,42 +569,7 @@ async def get_results_stats() -> Dict[str, Any]:
     }
     """
     try:
-        with engine.begin() as conn:
-            # Get total count
-            total_stmt = select(func.count()).select_from(results_table)
-            total_count = conn.execute(total_stmt).scalar() or 0
-            
-            # Get count by source
-            source_stmt = select(
-                results_table.c.source,
-                func.count().label("count")
-            ).group_by(results_table.c.source)
-            source_results = conn.execute(source_stmt).fetchall()
-            
-            by_source = {}
-            for source, count in source_results:
-                by_source[source] = count
-            
-            # Get all results to compute emotion statistics
-            all_stmt = select(results_table)
-            all_rows = conn.execute(all_stmt).fetchall()
-            
-            by_emotion = {}
-            for row in all_rows:
-                try:
-                    payload = json.loads(row.payload)
-                    emotion = payload.get("emotion")
-                    if emotion:
-                        by_emotion[emotion] = by_emotion.get(emotion, 0) + 1
-                except Exception as e:
-                    logger.warning(f"Error parsing result row {row.id}: {e}")
-                    continue
-            
-            return JSONResponse(content={
-                "total_count": total_count,
-                "by_source": by_source,
-                "by_emotion": by_emotion
-            })
+        return await _conditional_response(request, run_db, _get_results_stats_sync)
     except Exception as e:
         logger.error(f"Error fetching results stats: {e}")
         return JSONResponse(
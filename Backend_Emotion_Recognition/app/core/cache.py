@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def weights_fingerprint(paths: list, extra: str = "") -> str:
+    """Short model version derived from weight files (name, size, mtime) and extra config.
+
+    Any change to the weight files or to `extra` yields a new version,
+    which invalidates cached results for the old one.
+    """
+    h = hashlib.sha256(extra.encode())
+    for p in paths:
+        p = Path(p)
+        if p.exists():
+            st = p.stat()
+            h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns}".encode())
+        else:
+            h.update(f"{p.name}:missing".encode())
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    """Two-tier prediction cache keyed by content hash, scoped to a model version.
+
+    Tier 1 is an in-process LRU; tier 2 is a JSON file store under
+    RESULT_CACHE_DIR/<namespace>/<version>/ that survives restarts.
+    Directories of other versions are removed on creation. The disk tier is bounded
+    by the file lifecycle sweep (RESULT_CACHE_MAX_AGE_HOURS / RESULT_CACHE_MAX_BYTES);
+    disk hits refresh the file mtime so eviction is least-recently-used.
+    """
+
+    def __init__(self, namespace: str, version: str):
+        self.namespace = namespace
+        self.version = version
+        self.enabled = settings.RESULT_CACHE_ENABLED
+        self.max_items = settings.RESULT_CACHE_MEMORY_ITEMS
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk_dir = Path(settings.RESULT_CACHE_DIR) / namespace / version
+        if self.enabled:
+            self._prune_old_versions()
+
+    def _prune_old_versions(self):
+        root = self.disk_dir.parent
+        try:
+            root.mkdir(parents=True, exist_ok=True)
+            for d in root.iterdir():
+                if d.is_dir() and d.name != self.version:
+                    shutil.rmtree(d, ignore_errors=True)
+                    logger.info(f"Removed stale {self.namespace} result cache version {d.name}")
+        except Exception as e:
+            logger.warning(f"Could not prune result cache: {e}")
+
+    def _disk_path(self, content_hash: str) -> Path:
+        return self.disk_dir / content_hash[:2] / f"{content_hash}.json"
+
+    def get(self, content_hash: str) -> dict | None:
+        if not self.enabled or not content_hash:
+            return None
+        with self._lock:
+            if content_hash in self._memory:
+                self._memory.move_to_end(content_hash)
+                return dict(self._memory[content_hash])
+
+        path = self._disk_path(content_hash)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Corrupt cache entry {path}: {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._remember(content_hash, result)
+        return dict(result)
+
+    def put(self, content_hash: str, result: dict):
+        if not self.enabled or not content_hash:
+            return
+        result = {k: v for k, v in result.items() if k != "analysis_id"}
+        self._remember(content_hash, result)
+
+        path = self._disk_path(content_hash)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Could not write cache entry {path}: {e}")
+
+    def _remember(self, content_hash: str, result: dict):
+        with self._lock:
+            self._memory[content_hash] = result
+            self._memory.move_to_end(content_hash)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+
+class ResponseCache:
+    """In-process LRU of serialized responses keyed by request, scoped to a data version.
+
+    Entries of older versions are dropped as soon as a newer version is seen.
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.version = None
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version) -> bytes | None:
+        with self._lock:
+            if version != self.version:
+                return None
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def put(self, key: str, version, body: bytes):
+        with self._lock:
+            if version != self.version:
+                if self.version is not None and version < self.version:
+                    return
+                self._items.clear()
+                self.version = version
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
@@ -1,28 +1,126 @@
+import asyncio
 import json
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from sqlalchemy import (
     create_engine,
+    event,
+    inspect,
     MetaData,
     Table,
     Column,
     Integer,
+    Float,
+    Index,
+    LargeBinary,
     String,
+    Date,
     DateTime,
     Text,
+    and_,
+    cast,
     func,
+    literal_column,
+    select,
 )
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.pool import NullPool
-from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.pool import StaticPool
 from app.core.config import settings
 from app.core.logger import setup_logger
+from app.core.result_events import result_events
 
 logger = setup_logger(__name__)
 
 
+def _create_engine(url: str):
+    """Pooled engine. SQLite (selected by URL) runs in WAL mode with a busy timeout,
+    so readers don't block the writer during local load tests."""
+    pool_kwargs = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE or -1,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return create_engine(url, echo=settings.DB_ECHO, **pool_kwargs)
+
+    in_memory = parsed.database in (None, "", ":memory:")
+    connect_args = {"check_same_thread": False, "timeout": settings.DB_POOL_TIMEOUT}
+    if in_memory:
+        # 1 connection dùng chung, nếu không mỗi connection là 1 DB rỗng riêng
+        sqlite_engine = create_engine(
+            url, echo=settings.DB_ECHO, connect_args=connect_args, poolclass=StaticPool
+        )
+    else:
+        sqlite_engine = create_engine(
+            url, echo=settings.DB_ECHO, connect_args=connect_args, **pool_kwargs
+        )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # pysqlite tự quản lý BEGIN sai với SAVEPOINT; để SQLAlchemy phát BEGIN (xem _sqlite_begin)
+        dbapi_conn.isolation_level = None
+        cursor = dbapi_conn.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.DB_POOL_TIMEOUT * 1000}")
+        cursor.close()
+
+    @event.listens_for(sqlite_engine, "begin")
+    def _sqlite_begin(conn):
+        # Transaction có ghi (begin_write) lấy write lock ngay từ đầu: trong WAL, transaction
+        # đọc trước rồi mới ghi sẽ lỗi "database is locked" ngay, busy_timeout không giúp được
+        if conn.get_execution_options().get("sqlite_immediate"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+    return sqlite_engine
+
+
 # Create engine
 _url = settings.get_sqlalchemy_url()
-engine = create_engine(_url, echo=settings.DB_ECHO, poolclass=NullPool)
+engine = _create_engine(_url)
 metadata = MetaData()
+# Transaction có ghi: SQLite dùng BEGIN IMMEDIATE, dialect khác không đổi
+_write_engine = engine.execution_options(sqlite_immediate=True)
+
+
+def begin_write():
+    """Dùng thay engine.begin() cho mọi transaction có INSERT / UPDATE / DELETE"""
+    return _write_engine.begin()
+
+
+# Blocking DB calls run here instead of on the event loop; sized to the
+# connection pool so threads don't queue on pool checkout
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_THREADS or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    thread_name_prefix="db",
+)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking DB function on the dedicated DB thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, partial(fn, *args, **kwargs))
+
+
+def _close_db_sync():
+    _db_executor.shutdown(wait=True)
+    engine.dispose()
+
+
+async def close_db():
+    """Wait for in-flight DB calls, then close pooled connections (app shutdown)."""
+    await asyncio.get_running_loop().run_in_executor(None, _close_db_sync)
+    logger.info("Database connections closed")
 
 # Results table: store JSON payload as text
 results_table = Table(
@@ -34,41 +132,545 @@ results_table = Table(
     Column("payload", Text, nullable=False),
     Column("metadata", Text, nullable=True),
     Column("trash", Integer, nullable=False, server_default="0"),
+    # Denormalized từ payload để lọc / group trong SQL (backfill: migrate_results_columns)
+    Column("emotion", String(32), nullable=True),
+    Column("confidence", Float, nullable=True),
+    Column("all_emotions", Text, nullable=True),
+    Column("model_name", String(64), nullable=True),
+    # Keyset pagination trên (timestamp, id) theo từng bộ lọc
+    Index("ix_results_trash_timestamp", "trash", "timestamp", "id"),
+    Index("ix_results_source_timestamp", "source", "timestamp", "id"),
+    # SQLite: AUTOINCREMENT để id của row đã xóa / archive không bị cấp lại
+    sqlite_autoincrement=True,
+)
+
+# Số result theo (ngày, source, emotion, trash), cập nhật cùng transaction với mỗi
+# insert / trash / restore / delete để /results/stats không phải quét bảng results.
+# emotion rỗng ("") = result không có emotion
+results_stats_table = Table(
+    "results_stats",
+    metadata,
+    Column("day", Date, primary_key=True),
+    Column("source", String(50), primary_key=True),
+    Column("emotion", String(32), primary_key=True),
+    Column("trash", Integer, primary_key=True),
+    Column("result_count", Integer, nullable=False, server_default="0"),
+)
+
+# Cold storage cho result cũ / trash đã empty (app/services/archive_service.py).
+# Cùng cột với results để export đọc được; payload / metadata nén zlib.
+# Khóa riêng (archive_id): id của results không unique ở đây, DB cũ (SQLite không
+# AUTOINCREMENT) có thể đã cấp lại id của row bị xóa / archive
+results_archive_table = Table(
+    "results_archive",
+    metadata,
+    Column("archive_id", Integer, primary_key=True, autoincrement=True),
+    Column("id", Integer, nullable=False),
+    Column("source", String(50), nullable=False),
+    Column("timestamp", DateTime, nullable=False),
+    Column("trash", Integer, nullable=False, server_default="0"),
+    Column("emotion", String(32), nullable=True),
+    Column("confidence", Float, nullable=True),
+    Column("all_emotions", Text, nullable=True),
+    Column("model_name", String(64), nullable=True),
+    Column("payload_z", LargeBinary, nullable=False),
+    Column("metadata_z", LargeBinary, nullable=True),
+    Column("archived_at", DateTime, nullable=False),
+    Index("ix_results_archive_id", "id"),
+    Index("ix_results_archive_timestamp", "timestamp", "id"),
+    Index("ix_results_archive_source_timestamp", "source", "timestamp", "id"),
+)
+
+# Cột thêm sau khi bảng results đã tồn tại (ALTER TABLE + backfill)
+DENORMALIZED_COLUMNS = ("emotion", "confidence", "all_emotions", "model_name")
+BACKFILL_BATCH_SIZE = 1000
+
+# Block id cấp phía client cho write-behind (app/core/result_writer.py): next_id của bảng results
+id_sequences_table = Table(
+    "id_sequences",
+    metadata,
+    Column("name", String(50), primary_key=True),
+    Column("next_id", Integer, nullable=False),
+)
+
+# Version của bảng results, tăng trong cùng transaction với mọi thay đổi;
+# dùng làm ETag cho các endpoint /results/*
+table_versions_table = Table(
+    "table_versions",
+    metadata,
+    Column("name", String(50), primary_key=True),
+    Column("version", Integer, nullable=False, server_default="0"),
+    Column("updated_at", DateTime, server_default=func.now(), nullable=False),
+)
+
+# Fusion jobs (async queue): persisted so queued jobs survive a restart
+jobs_table = Table(
+    "jobs",
+    metadata,
+    Column("id", String(32), primary_key=True),
+    Column("status", String(20), nullable=False, server_default="queued"),
+    Column("filename", String(255), nullable=True),
+    Column("file_path", String(500), nullable=False),
+    Column("result", Text, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_at", DateTime, server_default=func.now(), nullable=False),
+    Column("updated_at", DateTime, server_default=func.now(), nullable=False),
 )
 
 
 def init_db():
-    """Create tables if they don't exist."""
+    """Create tables if they don't exist and migrate older `results` schemas."""
     try:
+        had_stats = inspect(engine).has_table("results_stats")
         metadata.create_all(bind=engine)
-        logger.info("Database tables ensured (results table)")
+        _ensure_version_row()
+        migrate_results_columns()
+        if not had_stats:
+            rebuild_stats()
+        logger.info("Database tables ensured (results, results_stats, results_archive, jobs tables)")
     except SQLAlchemyError as e:
         logger.error(f"Could not initialize DB: {e}")
 
 
-def _save_result_sync(source: str, payload: dict, metadata_obj: dict | None = None) -> int | None:
+def _denormalized_values(payload: dict, metadata_obj: dict | None = None) -> dict:
+    """emotion / confidence / all_emotions / model_name lấy từ payload (model_name có thể nằm trong metadata)"""
+    payload = payload if isinstance(payload, dict) else {}
+    metadata_obj = metadata_obj if isinstance(metadata_obj, dict) else {}
+    confidence = payload.get("confidence")
+    all_emotions = payload.get("all_emotions")
+    return {
+        "emotion": payload.get("emotion"),
+        "confidence": float(confidence) if isinstance(confidence, (int, float)) else None,
+        "all_emotions": json.dumps(all_emotions, ensure_ascii=False) if all_emotions is not None else None,
+        "model_name": payload.get("model_name") or metadata_obj.get("model_name"),
+    }
+
+
+def migrate_results_columns(backfill: bool = False) -> int:
+    """
+    Thêm các cột denormalized + index còn thiếu vào bảng `results` đã tồn tại,
+    rồi backfill từ payload theo batch (keyset trên id). Idempotent.
+    Backfill chạy khi vừa thêm cột, hoặc khi backfill=True (chạy lại sau khi bị ngắt).
+    Returns:
+        số row đã backfill
+    """
+    existing = {col["name"] for col in inspect(engine).get_columns("results")}
+    missing = [name for name in DENORMALIZED_COLUMNS if name not in existing]
+    with begin_write() as conn:
+        for name in missing:
+            col_type = results_table.c[name].type.compile(dialect=engine.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE results ADD {name} {col_type} NULL")
+            logger.info(f"Added column results.{name}")
+        for index in results_table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+    if not (missing or backfill):
+        return 0
+
+    c = results_table.c
+    backfilled = 0
+    last_id = 0
+    while True:
+        with begin_write() as conn:
+            rows = conn.execute(
+                select(c.id, c.payload, c["metadata"].label("meta"))
+                .where(c.id > last_id, c.emotion.is_(None))
+                .order_by(c.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                try:
+                    values = _denormalized_values(
+                        json.loads(row.payload),
+                        json.loads(row.meta) if row.meta else None,
+                    )
+                except Exception as e:
+                    logger.warning(f"Cannot backfill result row {row.id}: {e}")
+                    continue
+                conn.execute(results_table.update().where(c.id == row.id).values(**values))
+            last_id = rows[-1].id
+            backfilled += len(rows)
+            version_info = bump_results_version(conn)
+        remember_results_version(version_info)
+    logger.info(f"Backfilled denormalized columns for {backfilled} results rows")
+    return backfilled
+
+
+def _ensure_version_row():
+    tv = table_versions_table.c
+    with begin_write() as conn:
+        exists = conn.execute(select(tv.version).where(tv.name == "results")).first()
+        if exists is None:
+            conn.execute(table_versions_table.insert().values(name="results", version=0, updated_at=datetime.now()))
+
+
+def bump_results_version(conn) -> tuple:
+    """Tăng version của results trong transaction hiện tại. Returns: (version, updated_at)"""
+    tv = table_versions_table.c
+    conn.execute(
+        table_versions_table.update()
+        .where(tv.name == "results")
+        .values(version=tv.version + 1, updated_at=datetime.now())
+    )
+    row = conn.execute(select(tv.version, tv.updated_at).where(tv.name == "results")).first()
+    return (row.version, row.updated_at) if row is not None else (0, None)
+
+
+# Version đã biết trong process: ghi ở process này cập nhật ngay, còn thay đổi từ
+# process khác được đọc lại từ DB sau RESULTS_VERSION_TTL_S giây
+_results_version = {"version": None, "updated_at": None, "checked": 0.0}
+_results_version_lock = threading.Lock()
+
+
+def remember_results_version(version_info: tuple | None) -> None:
+    """Gọi sau khi transaction đã commit"""
+    if not version_info:
+        return
+    version, updated_at = version_info
+    with _results_version_lock:
+        known = _results_version["version"]
+        if known is None or version >= known:
+            _results_version["version"] = version
+            _results_version["updated_at"] = updated_at
+        _results_version["checked"] = time.monotonic()
+
+
+def _get_results_version_sync() -> tuple:
+    tv = table_versions_table.c
+    with engine.begin() as conn:
+        row = conn.execute(select(tv.version, tv.updated_at).where(tv.name == "results")).first()
+    return (row.version, row.updated_at) if row is not None else (0, None)
+
+
+async def current_results_version() -> tuple:
+    """(version, updated_at) của bảng results, không chạm DB nếu còn trong TTL"""
+    with _results_version_lock:
+        fresh = time.monotonic() - _results_version["checked"] < settings.RESULTS_VERSION_TTL_S
+        if _results_version["version"] is not None and fresh:
+            return _results_version["version"], _results_version["updated_at"]
+    version_info = await run_db(_get_results_version_sync)
+    remember_results_version(version_info)
+    return version_info
+
+
+def _day_expr(col):
+    """DATE(timestamp); SQLite CAST(... AS DATE) trả về số nên dùng date()"""
+    if engine.dialect.name == "sqlite":
+        return func.date(col, type_=Date)
+    return cast(col, Date)
+
+
+def _upsert_stat(conn, key: dict, delta: int) -> None:
+    s = results_stats_table.c
+    where = and_(*(s[k] == v for k, v in key.items()))
+    update = results_stats_table.update().where(where).values(result_count=s.result_count + delta)
+    if conn.execute(update).rowcount:
+        return
     try:
-        with engine.begin() as conn:
-            ins = results_table.insert().values(
-                source=source,
-                payload=json.dumps(payload, ensure_ascii=False),
-                metadata=json.dumps(metadata_obj, ensure_ascii=False) if metadata_obj else None,
+        with conn.begin_nested():
+            conn.execute(results_stats_table.insert().values(**key, result_count=delta))
+    except IntegrityError:
+        # transaction khác vừa tạo cùng key
+        conn.execute(update)
+
+
+def adjust_stats(conn, where, sign: int, trash: int | None = None) -> int:
+    """
+    Cộng (sign=+1) / trừ (sign=-1) các result khớp `where` vào results_stats.
+    Gọi trong cùng transaction với thay đổi: sau INSERT, trước DELETE; khi đổi trash
+    thì trước UPDATE, trừ ở key cũ rồi cộng với trash=<giá trị mới>.
+    Returns:
+        số result khớp `where`
+    """
+    c = results_table.c
+    day = _day_expr(c.timestamp)
+    rows = conn.execute(
+        select(day.label("day"), c.source, c.emotion, c.trash, func.count().label("n"))
+        .where(where)
+        .group_by(day, c.source, c.emotion, c.trash)
+    ).fetchall()
+    total = 0
+    for row in rows:
+        key = {
+            "day": row.day,
+            "source": row.source,
+            "emotion": row.emotion or "",
+            "trash": row.trash if trash is None else trash,
+        }
+        _upsert_stat(conn, key, sign * row.n)
+        total += row.n
+    return total
+
+
+def rebuild_stats() -> int:
+    """Tính lại toàn bộ results_stats từ bảng results (maintenance). Returns: số bucket"""
+    c = results_table.c
+    day = _day_expr(c.timestamp)
+    # NULL và '' cùng vào bucket emotion '' (khóa chính của results_stats) -> group theo biểu thức đã coalesce
+    emotion = func.coalesce(c.emotion, literal_column("''"))
+    grouped = select(day, c.source, emotion, c.trash, func.count()).group_by(day, c.source, emotion, c.trash)
+    with begin_write() as conn:
+        conn.execute(results_stats_table.delete())
+        conn.execute(
+            results_stats_table.insert().from_select(
+                ["day", "source", "emotion", "trash", "result_count"], grouped
             )
+        )
+        buckets = conn.execute(select(func.count()).select_from(results_stats_table)).scalar() or 0
+    logger.info(f"Rebuilt results_stats: {buckets} buckets")
+    return buckets
+
+
+def result_row(source: str, payload: dict, metadata_obj: dict | None = None) -> dict:
+    """Giá trị các cột của 1 row results (trừ id / timestamp)"""
+    return {
+        "source": source,
+        "payload": json.dumps(payload, ensure_ascii=False),
+        "metadata": json.dumps(metadata_obj, ensure_ascii=False) if metadata_obj else None,
+        "trash": 0,
+        **_denormalized_values(payload, metadata_obj),
+    }
+
+
+def _publish_new(row: dict) -> None:
+    """Event `new` cho live feed, cùng dạng với item của /results/query"""
+    result_events.publish("new", {
+        "id": row["id"],
+        "source": row["source"],
+        "timestamp": row["timestamp"].isoformat() if row.get("timestamp") else None,
+        "emotion": row.get("emotion"),
+        "confidence": row.get("confidence"),
+        "all_emotions": json.loads(row["all_emotions"]) if row.get("all_emotions") else {},
+        "trash": row.get("trash", 0),
+    })
+
+
+def reserve_result_ids(n: int) -> int:
+    """
+    Cấp 1 block n id liên tiếp cho results, dùng chung giữa các process.
+    Returns:
+        id đầu tiên của block [first, first + n)
+    """
+    seq = id_sequences_table.c
+    with begin_write() as conn:
+        # UPDATE trước để giữ lock trên row sequence tới hết transaction
+        bumped = conn.execute(
+            id_sequences_table.update()
+            .where(seq.name == "results")
+            .values(next_id=seq.next_id + n)
+        ).rowcount
+        if bumped:
+            first = conn.execute(
+                select(seq.next_id).where(seq.name == "results")
+            ).scalar() - n
+        else:
+            first = None
+        # Không cấp id đã dùng (row ghi bằng autoincrement hoặc sequence mới tạo);
+        # tính cả results_archive vì row đã archive bị xóa khỏi results
+        max_id = max(
+            conn.execute(select(func.max(results_table.c.id))).scalar() or 0,
+            conn.execute(select(func.max(results_archive_table.c.id))).scalar() or 0,
+        )
+        if first is None or first <= max_id:
+            first = max_id + 1
+            if bumped:
+                conn.execute(
+                    id_sequences_table.update()
+                    .where(seq.name == "results")
+                    .values(next_id=first + n)
+                )
+            else:
+                conn.execute(id_sequences_table.insert().values(name="results", next_id=first + n))
+    return first
+
+
+def insert_results_bulk(rows: list[dict]) -> None:
+    """1 executemany INSERT cho cả batch (id + timestamp đã có sẵn) + cập nhật results_stats"""
+    with begin_write() as conn:
+        conn.execute(results_table.insert(), rows)
+        adjust_stats(conn, results_table.c.id.in_([row["id"] for row in rows]), +1)
+        version_info = bump_results_version(conn)
+    remember_results_version(version_info)
+    for row in rows:
+        _publish_new(row)
+
+
+# Write-behind writer đang chạy (set bởi ResultWriter.start), None = ghi đồng bộ
+_result_writer = None
+
+
+def set_result_writer(writer) -> None:
+    global _result_writer
+    _result_writer = writer
+
+
+def _save_result_sync(source: str, payload: dict, metadata_obj: dict | None = None) -> int | None:
+    try:
+        row = result_row(source, payload, metadata_obj)
+        row["timestamp"] = datetime.now()
+        with begin_write() as conn:
+            ins = results_table.insert().values(**row)
             result = conn.execute(ins)
             # result.inserted_primary_key may be DB-specific
             try:
                 pk = result.inserted_primary_key[0]
             except Exception:
                 pk = None
-            return pk
+            if pk is not None:
+                adjust_stats(conn, results_table.c.id == pk, +1)
+            version_info = bump_results_version(conn)
+        remember_results_version(version_info)
+        if pk is not None:
+            _publish_new({**row, "id": pk})
+        return pk
     except SQLAlchemyError as e:
         logger.error(f"DB insert error: {e}")
         return None
 
 
 async def save_result(source: str, payload: dict, metadata_obj: dict | None = None) -> int | None:
-    """Async wrapper that runs DB insert in threadpool to avoid blocking event loop."""
-    return await run_in_threadpool(_save_result_sync, source, payload, metadata_obj)
+    """Async wrapper that runs DB insert in the DB thread pool to avoid blocking event loop.
+    In write-behind mode the row is queued and its pre-allocated id returned immediately."""
+    if _result_writer is not None:
+        return await _result_writer.submit(source, payload, metadata_obj)
+    return await run_db(_save_result_sync, source, payload, metadata_obj)
+
+
+def _job_to_dict(row) -> dict:
+    return {
+        "job_id": row.id,
+        "status": row.status,
+        "filename": row.filename,
+        "file_path": row.file_path,
+        "result": json.loads(row.result) if row.result else None,
+        "error": row.error,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+    }
+
+
+def _create_job_sync(job_id: str, filename: str | None, file_path: str) -> dict | None:
+    try:
+        with begin_write() as conn:
+            conn.execute(
+                jobs_table.insert().values(
+                    id=job_id, status="queued", filename=filename, file_path=file_path
+                )
+            )
+            row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).first()
+            return _job_to_dict(row)
+    except SQLAlchemyError as e:
+        logger.error(f"DB job insert error: {e}")
+        return None
+
+
+def _update_job_sync(job_id: str, status: str, result: dict | None = None, error: str | None = None) -> None:
+    try:
+        with begin_write() as conn:
+            conn.execute(
+                jobs_table.update()
+                .where(jobs_table.c.id == job_id)
+                .values(
+                    status=status,
+                    result=json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error=error,
+                    updated_at=datetime.now(),
+                )
+            )
+    except SQLAlchemyError as e:
+        logger.error(f"DB job update error: {e}")
+
+
+def _claim_job_sync(job_id: str) -> dict | None:
+    """
+    queued -> running nguyên tử (UPDATE ... WHERE status='queued'): với nhiều uvicorn worker
+    cùng đọc bảng jobs, chỉ 1 process claim được job.
+    Returns:
+        job đã claim; None nếu job không tồn tại / đã được process khác claim / đã xong
+    """
+    with begin_write() as conn:
+        claimed = conn.execute(
+            jobs_table.update()
+            .where(and_(jobs_table.c.id == job_id, jobs_table.c.status == "queued"))
+            .values(status="running", updated_at=datetime.now())
+        ).rowcount
+        if claimed != 1:
+            return None
+        row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).first()
+        return _job_to_dict(row)
+
+
+def _touch_job_sync(job_id: str) -> None:
+    """Heartbeat của job đang running: gia hạn lease (updated_at)"""
+    with begin_write() as conn:
+        conn.execute(
+            jobs_table.update()
+            .where(and_(jobs_table.c.id == job_id, jobs_table.c.status == "running"))
+            .values(updated_at=datetime.now())
+        )
+
+
+def _get_job_sync(job_id: str) -> dict | None:
+    with engine.begin() as conn:
+        row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).first()
+        return _job_to_dict(row) if row is not None else None
+
+
+def _requeue_unfinished_jobs_sync() -> list[dict]:
+    """Reset 'running' jobs whose lease expired (no heartbeat for FUSION_JOB_LEASE_S, the
+    process running them died) to 'queued' and return all queued jobs."""
+    expired = datetime.now() - timedelta(seconds=settings.FUSION_JOB_LEASE_S)
+    with begin_write() as conn:
+        conn.execute(
+            jobs_table.update()
+            .where(and_(jobs_table.c.status == "running", jobs_table.c.updated_at < expired))
+            .values(status="queued", updated_at=datetime.now())
+        )
+        rows = conn.execute(
+            select(jobs_table)
+            .where(jobs_table.c.status == "queued")
+            .order_by(jobs_table.c.created_at)
+        ).fetchall()
+        return [_job_to_dict(row) for row in rows]
+
+
+async def create_job(job_id: str, filename: str | None, file_path: str) -> dict | None:
+    return await run_db(_create_job_sync, job_id, filename, file_path)
+
+
+async def update_job(job_id: str, status: str, result: dict | None = None, error: str | None = None) -> None:
+    await run_db(_update_job_sync, job_id, status, result, error)
+
+
+async def get_job(job_id: str) -> dict | None:
+    return await run_db(_get_job_sync, job_id)
+
+
+async def requeue_unfinished_jobs() -> list[dict]:
+    return await run_db(_requeue_unfinished_jobs_sync)
+
+
+async def claim_job(job_id: str) -> dict | None:
+    return await run_db(_claim_job_sync, job_id)
+
+
+async def touch_job(job_id: str) -> None:
+    await run_db(_touch_job_sync, job_id)
+
+
+def delete_finished_jobs_sync(max_age_hours: float) -> int:
+    """Xóa job done / failed cập nhật lần cuối quá max_age_hours giờ (0 = giữ mãi)"""
+    if not max_age_hours:
+        return 0
+    cutoff = datetime.now() - timedelta(hours=max_age_hours)
+    with begin_write() as conn:
+        return conn.execute(
+            jobs_table.delete().where(
+                and_(jobs_table.c.status.in_(("done", "failed")), jobs_table.c.updated_at < cutoff)
+            )
+        ).rowcount
 
 
 # Ensure tables created at import time (no-op if already exists)
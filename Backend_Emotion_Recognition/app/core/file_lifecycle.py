@@ -0,0 +1,211 @@
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.db import delete_finished_jobs_sync
+from app.core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Thư mục con do component khác tự quản lý (job input bị xóa khi job xong)
+SKIP_SUBDIRS = {"jobs"}
+
+
+class DirectoryPolicy:
+    """Giới hạn cho 1 thư mục: tuổi tối đa (giờ) và tổng dung lượng (bytes); 0 = không giới hạn"""
+
+    def __init__(self, name: str, path: Path, max_age_hours: float, max_bytes: int):
+        self.name = name
+        self.path = Path(path)
+        self.max_age_hours = max_age_hours
+        self.max_bytes = max_bytes
+
+
+def _scan(root: Path) -> list:
+    """
+    os.scandir đệ quy (1 lần stat mỗi file), bỏ qua SKIP_SUBDIRS.
+    Returns:
+        list (mtime, size, path)
+    """
+    files = []
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not (current == root and entry.name in SKIP_SUBDIRS):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            files.append((st.st_mtime, st.st_size, entry.path))
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"Could not remove {path}: {e}")
+        return False
+
+
+def enforce_policy(policy: DirectoryPolicy, now: float | None = None) -> dict:
+    """
+    1 lượt dọn thư mục: xóa file quá tuổi, sau đó nếu tổng dung lượng vẫn vượt quota
+    thì xóa file cũ nhất trước cho tới khi về dưới quota. File mới hơn
+    FILES_MIN_AGE_S không bị xóa vì quota (có thể đang được ghi / đọc).
+    Returns:
+        usage + số file / bytes đã xóa
+    """
+    now = time.time() if now is None else now
+    files = sorted(_scan(policy.path))  # cũ nhất trước
+    total = sum(size for _, size, _ in files)
+    evicted_files = 0
+    evicted_bytes = 0
+
+    kept = []
+    max_age_s = policy.max_age_hours * 3600
+    for mtime, size, path in files:
+        if max_age_s and now - mtime > max_age_s:
+            if _remove(path):
+                evicted_files += 1
+                evicted_bytes += size
+            total -= size
+        else:
+            kept.append((mtime, size, path))
+
+    if policy.max_bytes and total > policy.max_bytes:
+        for mtime, size, path in kept:
+            if total <= policy.max_bytes or now - mtime < settings.FILES_MIN_AGE_S:
+                break
+            if _remove(path):
+                evicted_files += 1
+                evicted_bytes += size
+            total -= size
+        if total > policy.max_bytes:
+            logger.warning(
+                f"{policy.name} still uses {total} bytes (quota {policy.max_bytes}) after eviction"
+            )
+
+    return {
+        "path": str(policy.path),
+        "files": len(files) - evicted_files,
+        "bytes": total,
+        "max_bytes": policy.max_bytes,
+        "max_age_hours": policy.max_age_hours,
+        "evicted_files": evicted_files,
+        "evicted_bytes": evicted_bytes,
+    }
+
+
+def _disk_usage(path: Path) -> dict:
+    try:
+        usage = shutil.disk_usage(path)
+    except OSError:
+        return {}
+    return {"total": usage.total, "used": usage.used, "free": usage.free}
+
+
+class FileLifecycleManager:
+    """Background task dọn UPLOAD_DIR / RESULTS_DIR / RESULT_CACHE_DIR mỗi FILES_SWEEP_INTERVAL_S giây,
+    kèm xóa row `jobs` đã xong quá FUSION_JOB_RETENTION_HOURS.
+
+    Việc scan + xóa chạy trên thread (asyncio.to_thread) nên không block request;
+    kết quả lượt dọn gần nhất được giữ lại cho GET /storage.
+    """
+
+    def __init__(self):
+        self.task = None
+        self.report = {}
+
+    def policies(self) -> list:
+        return [
+            DirectoryPolicy("uploads", settings.UPLOAD_DIR, settings.UPLOAD_MAX_AGE_HOURS, settings.UPLOAD_MAX_BYTES),
+            DirectoryPolicy("results", settings.RESULTS_DIR, settings.RESULTS_FILES_MAX_AGE_HOURS, settings.RESULTS_FILES_MAX_BYTES),
+            DirectoryPolicy("result_cache", settings.RESULT_CACHE_DIR, settings.RESULT_CACHE_MAX_AGE_HOURS, settings.RESULT_CACHE_MAX_BYTES),
+        ]
+
+    async def start(self):
+        if not settings.FILES_LIFECYCLE_ENABLED:
+            return
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"File lifecycle manager started (interval={settings.FILES_SWEEP_INTERVAL_S}s)")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"File lifecycle sweep failed: {e}")
+            await asyncio.sleep(settings.FILES_SWEEP_INTERVAL_S)
+
+    async def usage(self) -> dict:
+        """Report của lượt dọn gần nhất; chưa có (hoặc đang tắt) thì chỉ đo, không xóa"""
+        if self.report:
+            return self.report
+        return await asyncio.to_thread(self._usage_sync)
+
+    def _usage_sync(self) -> dict:
+        directories = {}
+        for policy in self.policies():
+            files = _scan(policy.path)
+            directories[policy.name] = {
+                "path": str(policy.path),
+                "files": len(files),
+                "bytes": sum(size for _, size, _ in files),
+                "max_bytes": policy.max_bytes,
+                "max_age_hours": policy.max_age_hours,
+            }
+        return {"swept_at": None, "directories": directories, "disk": _disk_usage(settings.BASE_DIR)}
+
+    async def sweep(self) -> dict:
+        self.report = await asyncio.to_thread(self._sweep_sync)
+        return self.report
+
+    def _sweep_sync(self) -> dict:
+        started = time.monotonic()
+        directories = {}
+        for policy in self.policies():
+            directories[policy.name] = stats = enforce_policy(policy)
+            if stats["evicted_files"]:
+                logger.info(
+                    f"Evicted {stats['evicted_files']} files ({stats['evicted_bytes']} bytes) from {policy.name}"
+                )
+        jobs_deleted = 0
+        try:
+            jobs_deleted = delete_finished_jobs_sync(settings.FUSION_JOB_RETENTION_HOURS)
+        except Exception as e:
+            logger.error(f"Finished job cleanup failed: {e}")
+        if jobs_deleted:
+            logger.info(f"Deleted {jobs_deleted} finished fusion jobs")
+        return {
+            "swept_at": datetime.now().isoformat(),
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "directories": directories,
+            "jobs_deleted": jobs_deleted,
+            "disk": _disk_usage(settings.BASE_DIR),
+        }
+
+
+file_lifecycle = FileLifecycleManager()
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from app.core.config import settings
+from app.core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+RESULT_EVENT_TYPES = ("new", "trash", "restore", "delete")
+
+
+class ResultEventBroadcaster:
+    """Fan-out trong process cho live feed /results/events (SSE).
+
+    publish() được gọi từ DB thread sau khi transaction commit; mỗi event được
+    serialize 1 lần vào ring buffer (RESULTS_EVENTS_BUFFER event gần nhất) và
+    các subscriber chỉ được đánh thức qua 1 asyncio.Event dùng chung, rồi tự đọc
+    buffer từ sau event id cuối cùng của mình -> chi phí mỗi client gần như 0
+    và client reconnect với Last-Event-ID nhận lại các event bị lỡ.
+
+    Event id = "<epoch>-<seq>": epoch đổi mỗi lần process khởi động, id của
+    epoch khác / đã rơi khỏi buffer -> client nhận event `reset` và phải refetch.
+    """
+
+    def __init__(self):
+        self.epoch = str(int(time.time()))
+        self._seq = 0
+        self._buffer = deque(maxlen=settings.RESULTS_EVENTS_BUFFER)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+    def publish(self, event_type: str, data: dict) -> None:
+        """Thread-safe; gọi sau khi thay đổi đã được commit"""
+        with self._lock:
+            self._seq += 1
+            self._buffer.append((self._seq, event_type, json.dumps(data, ensure_ascii=False)))
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def resume_from(self, last_event_id: str | None) -> int | None:
+        """
+        Returns:
+            seq để tiếp tục sau đó; None = không resume được (cần reset)
+        """
+        with self._lock:
+            current = self._seq
+            oldest = self._buffer[0][0] if self._buffer else current + 1
+        if not last_event_id:
+            return current
+        epoch, _, seq = last_event_id.partition("-")
+        try:
+            seq = int(seq)
+        except ValueError:
+            return None
+        if epoch != self.epoch or seq > current or seq < oldest - 1:
+            return None
+        return seq
+
+    def since(self, seq: int) -> list | None:
+        """
+        Returns:
+            list (seq, type, data) sau `seq`; None nếu đã có event bị đẩy khỏi buffer (client quá chậm)
+        """
+        with self._lock:
+            if self._buffer and seq < self._buffer[0][0] - 1:
+                return None
+            return [event for event in self._buffer if event[0] > seq]
+
+    def waiter(self) -> asyncio.Event | None:
+        """Lấy trước khi đọc since(): event publish sau thời điểm này chắc chắn set waiter"""
+        return self._wakeup
+
+    async def wait(self, waiter: asyncio.Event | None, timeout: float) -> None:
+        if waiter is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+result_events = ResultEventBroadcaster()
+
+
+def publish_ids(event_type: str, ids: list, count: int) -> None:
+    """trash / restore / delete: gửi ids nếu không quá RESULTS_EVENTS_MAX_IDS, ngược lại chỉ count
+    (ids = null -> client refetch)"""
+    if not count:
+        return
+    if len(ids) > settings.RESULTS_EVENTS_MAX_IDS:
+        ids = None
+    result_events.publish(event_type, {"ids": ids, "count": count})
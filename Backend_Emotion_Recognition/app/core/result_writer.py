@@ -0,0 +1,162 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.core.config import settings
+from app.core.logger import setup_logger
+from app.core.db import (
+    insert_results_bulk,
+    reserve_result_ids,
+    result_row,
+    run_db,
+    set_result_writer,
+)
+
+logger = setup_logger(__name__)
+
+FLUSH_BACKOFF_S = 0.5
+
+
+def _is_transient(e: Exception) -> bool:
+    """Lỗi retry được: OperationalError (mất kết nối, database is locked...) hoặc connection bị invalidate"""
+    return isinstance(e, OperationalError) or (isinstance(e, DBAPIError) and e.connection_invalidated)
+
+
+class ResultWriter:
+    """Write-behind cho save_result: row được đưa vào hàng đợi trong process,
+    1 background task gom lại và bulk INSERT mỗi RESULTS_FLUSH_INTERVAL_MS
+    hoặc khi đủ RESULTS_FLUSH_BATCH row.
+
+    Id được cấp trước theo block (reserve_result_ids) nên analysis_id trả về ngay,
+    timestamp lấy lúc submit. Hàng đợi giới hạn RESULTS_QUEUE_LIMIT: khi đầy,
+    submit phải chờ (backpressure). Lỗi tạm thời (DB mất kết nối, locked...) được retry
+    mãi với backoff tối đa RESULTS_FLUSH_MAX_BACKOFF_S; lỗi khác (IntegrityError,
+    DataError...) thì batch bị chia đôi để chỉ bỏ đúng row lỗi.
+    stop() flush hết trước khi thoát (tối đa RESULTS_SHUTDOWN_FLUSH_TIMEOUT_S giây).
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.task = None
+        self._next_id = 0
+        self._end_id = 0
+        self._id_lock = None
+        self._stopping = False
+
+    async def start(self):
+        if not settings.RESULTS_WRITE_BEHIND:
+            return
+        self.queue = asyncio.Queue(maxsize=settings.RESULTS_QUEUE_LIMIT)
+        self._stopping = False
+        self._id_lock = asyncio.Lock()
+        self.task = asyncio.create_task(self._run())
+        set_result_writer(self)
+        logger.info(
+            f"Result write-behind started (batch={settings.RESULTS_FLUSH_BATCH}, "
+            f"interval={settings.RESULTS_FLUSH_INTERVAL_MS}ms, limit={settings.RESULTS_QUEUE_LIMIT})"
+        )
+
+    async def stop(self):
+        """Ngừng nhận row mới, flush phần còn lại trong hàng đợi"""
+        if self.task is None:
+            return
+        set_result_writer(None)
+        self._stopping = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass  # _run tự dừng khi hàng đợi rỗng (self._stopping)
+        try:
+            # Hết timeout thì wait_for cancel task (vd. đang retry vì DB không truy cập được)
+            await asyncio.wait_for(self.task, settings.RESULTS_SHUTDOWN_FLUSH_TIMEOUT_S)
+            logger.info("Result write-behind stopped, queue flushed")
+        except asyncio.TimeoutError:
+            lost = [row["id"] for row in self._drain() if row is not None]
+            logger.error(
+                f"Result write-behind stopped before flushing (DB unavailable): "
+                f"current batch and {len(lost)} queued results lost, queued ids={lost}"
+            )
+        self.task = None
+
+    async def submit(self, source: str, payload: dict, metadata_obj: dict | None = None) -> int:
+        row = result_row(source, payload, metadata_obj)
+        row["id"] = await self._allocate_id()
+        row["timestamp"] = datetime.now()
+        if self.queue.full():
+            logger.warning("Result write-behind queue full, waiting for flush")
+        await self.queue.put(row)
+        return row["id"]
+
+    async def _allocate_id(self) -> int:
+        async with self._id_lock:
+            if self._next_id >= self._end_id:
+                block = settings.RESULTS_ID_BLOCK_SIZE
+                self._next_id = await run_db(reserve_result_ids, block)
+                self._end_id = self._next_id + block
+            result_id = self._next_id
+            self._next_id += 1
+            return result_id
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.RESULTS_FLUSH_INTERVAL_MS / 1000
+        while True:
+            if self._stopping and self.queue.empty():
+                break
+            row = await self.queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = loop.time() + interval
+            while len(batch) < settings.RESULTS_FLUSH_BATCH:
+                if self._stopping and self.queue.empty():
+                    break
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+    def _drain(self) -> list:
+        rows = []
+        while not self.queue.empty():
+            rows.append(self.queue.get_nowait())
+        return rows
+
+    async def _flush(self, batch: list):
+        """
+        Ghi batch. Lỗi tạm thời: retry tới khi thành công (hàng đợi giới hạn đã tạo backpressure).
+        Lỗi khác (IntegrityError, DataError, StatementError...): chia đôi batch để chỉ bỏ đúng
+        row lỗi, không để 1 row hỏng chặn cả hàng đợi.
+        """
+        attempt = 0
+        while True:
+            try:
+                await run_db(insert_results_bulk, batch)
+                logger.debug(f"Flushed {len(batch)} results")
+                return
+            except Exception as e:
+                if not _is_transient(e):
+                    if len(batch) == 1:
+                        logger.error(f"Dropped result {batch[0]['id']}: {e}")
+                        return
+                    mid = len(batch) // 2
+                    await self._flush(batch[:mid])
+                    await self._flush(batch[mid:])
+                    return
+                attempt += 1
+                delay = min(FLUSH_BACKOFF_S * 2 ** (attempt - 1), settings.RESULTS_FLUSH_MAX_BACKOFF_S)
+                logger.warning(
+                    f"Result flush of {len(batch)} rows failed (attempt {attempt}), retrying in {delay:.1f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+
+
+result_writer = ResultWriter()
@@ -2,8 +2,15 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.api import face_routes, audio_routes, audio_video_routes, results_routes
+from app.core.db import close_db
+from app.core.file_lifecycle import file_lifecycle
+from app.core.result_events import result_events
+from app.core.result_writer import result_writer
+from app.services.archive_service import result_archiver
+from app.utils.response_utils import FastJSONResponse
+from app.utils.upload_utils import UploadSizeLimitMiddleware
 
-app = FastAPI(title="Emotion Recognition API")
+app = FastAPI(title="Emotion Recognition API", default_response_class=FastJSONResponse)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -17,12 +24,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads before the multipart body is parsed
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Include routers
 app.include_router(face_routes.router, prefix="/face", tags=["Face"])
 app.include_router(audio_routes.router, prefix="/audio", tags=["Audio"])
 app.include_router(audio_video_routes.router, prefix="/audio-video", tags=["Audio-Video Fusion"])
 app.include_router(results_routes.router, prefix="/results", tags=["Results"])
 
+@app.on_event("startup")
+async def start_background_workers():
+    result_events.start()
+    await result_writer.start()
+    await audio_video_routes.job_queue.start()
+    await file_lifecycle.start()
+    await result_archiver.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await file_lifecycle.stop()
+    await result_archiver.stop()
+    await audio_video_routes.job_queue.stop()
+    await result_writer.stop()
+    await close_db()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Emotion Recognition API"}
@@ -30,4 +56,9 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint to verify server is running"""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/storage")
+async def storage():
+    """Disk usage of UPLOAD_DIR / RESULTS_DIR and the last file lifecycle sweep"""
+    return await file_lifecycle.usage()
\ No newline at end of file
@@ -2,7 +2,11 @@ import torch
 import torch.nn as nn
 import torchvision.models as models
 import os
+import time
+import contextlib
 
+from app.core.cache import weights_fingerprint
+from app.core.config import settings
 from app.core.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -11,6 +15,30 @@ logger = setup_logger(__name__)
 EMOTION_ORDER = ["angry", "disgust", "fear", "happy", "neutral", "sad"]
 
 
+# Key trong _extra_files của artifact TorchScript: fingerprint checkpoint lúc export
+ARTIFACT_FINGERPRINT_KEY = "checkpoint_fingerprint"
+
+
+def artifact_fingerprint(model_path: str) -> str:
+    """Fingerprint checkpoint + các setting được bake vào artifact khi trace"""
+    return weights_fingerprint(
+        [model_path],
+        extra=f"channels_last={settings.FUSION_CHANNELS_LAST},bf16={settings.FUSION_BF16}",
+    )
+
+
+def _peak_rss_mb():
+    """Peak RSS của process (MB), None nếu không hỗ trợ (vd. Windows)"""
+    try:
+        import resource
+        import sys
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
 class VideoEncoder(nn.Module):
     """Encode video frames using ResNet18"""
 
@@ -20,6 +48,11 @@ class VideoEncoder(nn.Module):
         # Loại bỏ fully connected layer cuối cùng
         self.backbone = nn.Sequential(*list(base.children())[:-1])
         self.out_dim = out_dim
+        self.channels_last = False
+        # Dedup các frame gần giống nhau (tắt mặc định, bật qua settings)
+        self.dedup = False
+        self.dedup_max_distance = 0
+        self.last_saved_passes = 0
 
     def forward(self, x):
         """
@@ -30,11 +63,54 @@ class VideoEncoder(nn.Module):
         """
         B, T, C, H, W = x.shape
         x = x.view(B * T, C, H, W)
+        if self.dedup:
+            return self._forward_dedup(x, B, T)
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
         feat = self.backbone(x)  # [B*T, 512, 1, 1]
         feat = feat.view(B, T, self.out_dim)
         feat = feat.mean(dim=1)  # [B,512]
         return feat
 
+    def _forward_dedup(self, x, B, T):
+        """
+        Chỉ chạy backbone trên các frame unique (gom nhóm theo average-hash 8x8,
+        khoảng cách Hamming <= dedup_max_distance), rồi lấy mean có trọng số
+        theo số lần xuất hiện. Với frame giống hệt nhau kết quả bằng mean gốc.
+        x: [B*T, 3, 224, 224]
+        """
+        hashes = self._average_hash(x)  # [B*T, 64]
+        dist = (hashes[:, None, :] != hashes[None, :, :]).sum(dim=-1).tolist()
+
+        reps = []  # index của frame đại diện cho mỗi nhóm
+        weights = torch.zeros(B, B * T)
+        for i in range(B * T):
+            group = next(
+                (u for u, r in enumerate(reps) if dist[i][r] <= self.dedup_max_distance),
+                None,
+            )
+            if group is None:
+                reps.append(i)
+                group = len(reps) - 1
+            weights[i // T, group] += 1.0
+
+        U = len(reps)
+        self.last_saved_passes = B * T - U
+
+        frames = x[reps]
+        if self.channels_last:
+            frames = frames.contiguous(memory_format=torch.channels_last)
+        feat = self.backbone(frames).view(U, self.out_dim)  # [U,512]
+        weights = (weights[:, :U] / T).to(device=feat.device, dtype=feat.dtype)
+        return weights @ feat  # [B,512]
+
+    @staticmethod
+    def _average_hash(x):
+        """Average-hash 8x8 trên ảnh grayscale: [N,3,H,W] -> [N,64] bool"""
+        gray = x.float().mean(dim=1, keepdim=True)
+        small = nn.functional.adaptive_avg_pool2d(gray, 8).flatten(1)
+        return small > small.mean(dim=1, keepdim=True)
+
 
 class AudioEncoder(nn.Module):
     """Encode mel-spectrogram using 2D CNN"""
@@ -72,9 +148,9 @@ class AudioEncoder(nn.Module):
 class AVEmotionNet(nn.Module):
     """Audio-Video Emotion Recognition Network - Fusion Model"""
 
-    def __init__(self, num_classes=6):
+    def __init__(self, num_classes=6, pretrained_backbone=True):
         super().__init__()
-        self.video_enc = VideoEncoder(out_dim=512, pretrained=True)
+        self.video_enc = VideoEncoder(out_dim=512, pretrained=pretrained_backbone)
         self.audio_enc = AudioEncoder(out_dim=256)
 
         # Fusion layer: concatenate video + audio features
@@ -100,19 +176,14 @@ class AVEmotionNet(nn.Module):
 class AudioVideoModel:
     """Wrapper class để load và sử dụng fusion model"""
 
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, optimize: bool = True):
+        t0 = time.perf_counter()
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         if torch.cuda.is_available():
             logger.info(f"PyTorch: Using GPU device: {torch.cuda.get_device_name(self.device)}")
         else:
             logger.info("PyTorch: Using CPU (no GPU found)")
 
-        # Tạo model
-        self.model = AVEmotionNet(num_classes=len(EMOTION_ORDER))
-        logger.info(
-            f"Model created with {len(EMOTION_ORDER)} emotion classes: {EMOTION_ORDER}"
-        )
-
         # Đường dẫn checkpoint mặc định
         if model_path is None:
             model_path = os.path.join(
@@ -121,38 +192,105 @@ class AudioVideoModel:
                 "fusion_video_audio",
                 "best_fusion.pth", 
             )
-
         model_path = os.path.abspath(model_path)
+        self.model_path = model_path
+
+        self.use_bf16 = False
+        artifact = self._load_artifact(settings.FUSION_ARTIFACT_PATH, model_path)
+        if artifact is not None:
+            self.model = None
+            self.runner = artifact
+        else:
+            self.model = self._build_model(model_path)
+            self.model.video_enc.dedup = settings.FUSION_FRAME_DEDUP
+            self.model.video_enc.dedup_max_distance = settings.FUSION_DEDUP_MAX_DISTANCE
+            # Module dùng để chạy inference (eager, TorchScript hoặc torch.compile)
+            self.runner = self.model
+
+        if optimize:
+            self.optimize()
+
+        rss = _peak_rss_mb()
+        logger.info(
+            f"[MODEL] Load time: {time.perf_counter() - t0:.2f}s, "
+            f"peak RSS: {f'{rss:.0f}MB' if rss is not None else 'n/a'}"
+        )
+        logger.info(f"[MODEL] SUCCESS: Model ready for inference on device: {self.device}")
+
+    def _load_artifact(self, artifact_path, model_path: str):
+        """
+        Artifact TorchScript đã trace + freeze sẵn (scripts/export_fusion_model.py).
+        Chỉ dùng khi fingerprint lưu trong artifact khớp checkpoint hiện tại và
+        không bật frame dedup (artifact trace cả network, không có dedup).
+        Returns:
+            ScriptModule, hoặc None -> build từ checkpoint
+        """
+        if not artifact_path or not os.path.exists(artifact_path):
+            return None
+        if settings.FUSION_FRAME_DEDUP:
+            logger.info("[MODEL] FUSION_FRAME_DEDUP on: ignoring TorchScript artifact (no dedup)")
+            return None
+        extra_files = {ARTIFACT_FINGERPRINT_KEY: ""}
+        runner = torch.jit.load(str(artifact_path), map_location=self.device, _extra_files=extra_files)
+        stored = extra_files[ARTIFACT_FINGERPRINT_KEY]
+        stored = stored.decode() if isinstance(stored, bytes) else stored
+        expected = artifact_fingerprint(model_path)
+        if stored != expected:
+            logger.warning(
+                f"[MODEL] TorchScript artifact {artifact_path} does not match checkpoint {model_path} "
+                f"(artifact={stored or 'none'}, checkpoint={expected}); loading checkpoint instead. "
+                "Re-run scripts/export_fusion_model.py"
+            )
+            return None
+        logger.info(f"[MODEL] Loading prebuilt TorchScript artifact: {artifact_path}")
+        runner.eval()
+        return runner
+
+    def _build_model(self, model_path: str) -> nn.Module:
+        """
+        Tạo AVEmotionNet và load checkpoint.
+        Khi có checkpoint thì không load ImageNet weights cho ResNet18 (sẽ bị ghi đè),
+        checkpoint được load bằng mmap + weights_only.
+        """
+        has_checkpoint = os.path.exists(model_path)
         logger.info(f"[MODEL] Model path: {model_path}")
-        logger.info(f"[MODEL] Path exists: {os.path.exists(model_path)}")
+        logger.info(f"[MODEL] Path exists: {has_checkpoint}")
+
+        # Tạo model
+        model = AVEmotionNet(
+            num_classes=len(EMOTION_ORDER), pretrained_backbone=not has_checkpoint
+        )
+        logger.info(
+            f"Model created with {len(EMOTION_ORDER)} emotion classes: {EMOTION_ORDER}"
+        )
 
-        if os.path.exists(model_path):
+        if has_checkpoint:
             try:
                 logger.info("[MODEL] Loading fusion model weights...")
-                checkpoint = torch.load(
-                    model_path, map_location=self.device, weights_only=False
-                )
+                checkpoint = self._load_checkpoint(model_path)
                 logger.info(f"[MODEL] Checkpoint type: {type(checkpoint)}")
 
                 # Handle checkpoint format giống Colab
                 if isinstance(checkpoint, dict):
                     if "model_state" in checkpoint:
                         logger.info("[MODEL] Found 'model_state' key")
-                        self.model.load_state_dict(checkpoint["model_state"])
+                        state_dict = checkpoint["model_state"]
                         if "val_f1" in checkpoint:
                             logger.info(
-                                f"[MODEL] Best val_f1 from checkpoint: {checkpoint['val_f1']:.4f}"
+                                f"[MODEL] Best val_f1 from checkpoint: {float(checkpoint['val_f1']):.4f}"
                             )
                     elif "state_dict" in checkpoint:
                         logger.info("[MODEL] Found 'state_dict' key")
-                        self.model.load_state_dict(checkpoint["state_dict"])
+                        state_dict = checkpoint["state_dict"]
                     else:
                         logger.info("[MODEL] Dict checkpoint as direct state dict")
-                        self.model.load_state_dict(checkpoint)
+                        state_dict = checkpoint
                 else:
                     logger.info("[MODEL] Direct state dict")
-                    self.model.load_state_dict(checkpoint)
+                    state_dict = checkpoint
 
+                # assign=True: dùng luôn tensor từ checkpoint (mmap), không copy thêm
+                model.load_state_dict(state_dict, assign=True)
                 logger.info("[MODEL] SUCCESS: Fusion model weights loaded!")
 
             except Exception as e:
@@ -166,9 +304,97 @@ class AudioVideoModel:
                 "[MODEL] WARNING: Model initialized with random weights (predictions will be wrong!)"
             )
 
-        self.model = self.model.to(self.device)
-        self.model.eval()
-        logger.info(f"[MODEL] SUCCESS: Model ready for inference on device: {self.device}")
+        model = model.to(self.device)
+        model.eval()
+        return model
+
+    def _load_checkpoint(self, model_path: str):
+        """torch.load với mmap + weights_only; fallback cho checkpoint cũ có object Python"""
+        try:
+            return torch.load(
+                model_path, map_location=self.device, mmap=True, weights_only=True
+            )
+        except Exception as e:
+            logger.warning(
+                f"[MODEL] mmap/weights_only load failed ({e}); falling back to full unpickling"
+            )
+            return torch.load(model_path, map_location=self.device, weights_only=False)
+
+    def optimize(self):
+        """
+        Áp dụng các tối ưu CPU theo settings (FUSION_*):
+        số thread intra-op, channels_last cho ResNet18, bf16 autocast,
+        và graph TorchScript (trace + freeze) hoặc torch.compile.
+        """
+        if settings.FUSION_NUM_THREADS > 0:
+            torch.set_num_threads(settings.FUSION_NUM_THREADS)
+        logger.info(f"[MODEL] intra-op threads: {torch.get_num_threads()}")
+
+        self.use_bf16 = settings.FUSION_BF16 and self._cpu_supports_bf16()
+        if settings.FUSION_BF16 and not self.use_bf16:
+            logger.warning("[MODEL] FUSION_BF16 requested but CPU has no bf16 support; using fp32")
+
+        if self.model is None:
+            # Artifact đã được trace + freeze sẵn khi export
+            return
+
+        if settings.FUSION_CHANNELS_LAST:
+            self.model.video_enc.backbone.to(memory_format=torch.channels_last)
+            self.model.video_enc.channels_last = True
+            logger.info("[MODEL] ResNet18 backbone using channels_last")
+
+        mode = settings.FUSION_GRAPH_MODE
+        if mode == "trace" and self.model.video_enc.dedup:
+            # Dedup có control flow phụ thuộc dữ liệu -> chỉ trace backbone ResNet18
+            try:
+                frames = torch.zeros(16, 3, 224, 224, device=self.device)
+                if self.model.video_enc.channels_last:
+                    frames = frames.contiguous(memory_format=torch.channels_last)
+                with torch.no_grad(), self._autocast():
+                    backbone = torch.jit.trace(self.model.video_enc.backbone, frames)
+                    self.model.video_enc.backbone = torch.jit.freeze(backbone)
+                logger.info("[MODEL] Frame dedup on: using TorchScript backbone only")
+            except Exception as e:
+                logger.warning(f"[MODEL] TorchScript backbone trace failed, using eager: {e}")
+        elif mode == "trace":
+            try:
+                video = torch.zeros(1, 16, 3, 224, 224, device=self.device)
+                audio = torch.zeros(1, 1, 80, 320, device=self.device)
+                with torch.no_grad(), self._autocast():
+                    traced = torch.jit.trace(self.model, (video, audio))
+                    self.runner = torch.jit.freeze(traced)
+                    # warm-up để JIT profiling/fusion chạy trước request đầu tiên
+                    for _ in range(2):
+                        self.runner(video, audio)
+                logger.info("[MODEL] Using TorchScript traced + frozen graph")
+            except Exception as e:
+                logger.warning(f"[MODEL] TorchScript trace failed, using eager: {e}")
+                self.runner = self.model
+        elif mode == "compile":
+            try:
+                self.runner = torch.compile(self.model)
+                logger.info("[MODEL] Using torch.compile graph")
+            except Exception as e:
+                logger.warning(f"[MODEL] torch.compile failed, using eager: {e}")
+                self.runner = self.model
+
+    def _cpu_supports_bf16(self) -> bool:
+        if self.device.type != "cpu":
+            return False
+        try:
+            return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+        except Exception:
+            return False
+
+    def _autocast(self):
+        if self.use_bf16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+    def _grad_context(self):
+        if settings.FUSION_INFERENCE_MODE:
+            return torch.inference_mode()
+        return torch.no_grad()
 
     def predict(self, video_tensor: torch.Tensor, audio_tensor: torch.Tensor):
         """
@@ -176,26 +402,42 @@ class AudioVideoModel:
         video_tensor: [1,T,3,224,224]
         audio_tensor: [1,1,80,T]
         """
+        return self.predict_batch(video_tensor, audio_tensor)[0]
+
+    def predict_batch(self, video_tensor: torch.Tensor, audio_tensor: torch.Tensor) -> list:
+        """
+        Predict emotion cho B clip trong 1 lần forward
+        video_tensor: [B,T,3,224,224]
+        audio_tensor: [B,1,80,T]
+        Returns:
+            list B dict {emotion, confidence, all_emotions}
+        """
         video_tensor = video_tensor.to(self.device)
         audio_tensor = audio_tensor.to(self.device)
 
-        with torch.no_grad():
-            logits = self.model(video_tensor, audio_tensor)
-            probs = torch.softmax(logits, dim=1)[0]  # [6]
-            pred_id = int(torch.argmax(probs).item())
+        with self._grad_context(), self._autocast():
+            logits = self.runner(video_tensor, audio_tensor).float()
+            if self.model is not None and self.model.video_enc.dedup:
+                logger.info(
+                    f"[VIDEO] Frame dedup saved {self.model.video_enc.last_saved_passes}/"
+                    f"{video_tensor.shape[0] * video_tensor.shape[1]} backbone passes"
+                )
+            batch_probs = torch.softmax(logits, dim=1).tolist()  # [B,6]
+
+        results = []
+        for probs in batch_probs:
+            pred_id = max(range(len(probs)), key=probs.__getitem__)
             pred_emotion = EMOTION_ORDER[pred_id]
-            confidence = float(probs[pred_id].item())
 
             # Log để debug
-            logger.info(f"[PRED] probs={probs.tolist()}, pred={pred_emotion}")
-
-            all_emotions = {
-                EMOTION_ORDER[i]: float(probs[i].item())
-                for i in range(len(EMOTION_ORDER))
-            }
-
-        return {
-            "emotion": pred_emotion,
-            "confidence": confidence,
-            "all_emotions": all_emotions,
-        }
+            logger.info(f"[PRED] probs={probs}, pred={pred_emotion}")
+
+            results.append({
+                "emotion": pred_emotion,
+                "confidence": float(probs[pred_id]),
+                "all_emotions": {
+                    EMOTION_ORDER[i]: float(probs[i])
+                    for i in range(len(EMOTION_ORDER))
+                },
+            })
+        return results
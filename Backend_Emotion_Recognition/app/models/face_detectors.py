@@ -0,0 +1,158 @@
+import threading
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class FaceDetector:
+    """Base class for face detectors.
+
+    Boxes are returned as (left, top, right, bottom, score) in full-resolution
+    pixel coordinates, sorted by score (highest first). If `scale` < 1 detection
+    runs on a downscaled copy of the image and boxes are mapped back; scale is
+    given per call so one instance serves pipelines with different scales.
+    """
+
+    name = "base"
+
+    def detect(self, image: np.ndarray, bgr: bool = False, scale: float = 1.0) -> list:
+        """Detect faces in one image (RGB by default, BGR if bgr=True, or grayscale)"""
+        return self.detect_batch([image], bgr=bgr, scale=scale)[0]
+
+    def detect_batch(self, images: list, bgr: bool = False, scale: float = 1.0) -> list:
+        """Detect faces in a list of images; returns one box list per image"""
+        scale = scale if 0 < scale < 1 else 1.0
+        small = [self._downscale(img, scale) for img in images]
+        batch_boxes = self._detect_batch(small, bgr, scale)
+        return [
+            sorted(
+                [self._upscale(box, scale) for box in boxes],
+                key=lambda b: b[4],
+                reverse=True,
+            )
+            for boxes in batch_boxes
+        ]
+
+    def _detect_batch(self, images: list, bgr: bool, scale: float) -> list:
+        raise NotImplementedError
+
+    @staticmethod
+    def _downscale(image: np.ndarray, scale: float) -> np.ndarray:
+        if scale == 1.0:
+            return image
+        return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def _upscale(box, scale: float) -> tuple:
+        left, top, right, bottom, score = box
+        s = scale
+        return (left / s, top / s, right / s, bottom / s, float(score))
+
+
+class HaarFaceDetector(FaceDetector):
+    """OpenCV Haar cascade (fast, lower recall; score is relative box area)"""
+
+    name = "haar"
+
+    def __init__(self):
+        cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            logger.error("Error loading face cascade classifier")
+            raise ValueError("Could not load face cascade classifier")
+        logger.info("Haar face detector loaded")
+
+    def _detect_batch(self, images: list, bgr: bool, scale: float) -> list:
+        # minSize 30px ở full resolution
+        min_side = max(10, int(round(30 * scale)))
+        results = []
+        for img in images:
+            if img.ndim == 3:
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY)
+            else:
+                gray = img
+            faces = self.cascade.detectMultiScale(
+                gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side)
+            )
+            area = float(gray.shape[0] * gray.shape[1])
+            results.append([
+                (float(x), float(y), float(x + w), float(y + h), (w * h) / area)
+                for (x, y, w, h) in faces
+            ])
+        return results
+
+
+class MTCNNFaceDetector(FaceDetector):
+    """facenet-pytorch MTCNN (slower, higher recall; batched when image sizes match)"""
+
+    name = "mtcnn"
+
+    def __init__(self):
+        import torch
+        from facenet_pytorch import MTCNN
+
+        self._torch = torch
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.mtcnn = MTCNN(keep_all=True, device=device)
+        logger.info(f"MTCNN face detector loaded (device={device})")
+
+    def _detect_batch(self, images: list, bgr: bool, scale: float) -> list:
+        rgb = [self._to_rgb(img, bgr) for img in images]
+        if len({img.shape for img in rgb}) == 1:
+            with self._torch.no_grad():
+                boxes, probs = self.mtcnn.detect(rgb)
+        else:
+            boxes, probs = [], []
+            for img in rgb:
+                with self._torch.no_grad():
+                    b, p = self.mtcnn.detect(img)
+                boxes.append(b)
+                probs.append(p)
+
+        results = []
+        for b, p in zip(boxes, probs):
+            if b is None:
+                results.append([])
+                continue
+            results.append([
+                (float(box[0]), float(box[1]), float(box[2]), float(box[3]), float(prob))
+                for box, prob in zip(b, p)
+            ])
+        return results
+
+    @staticmethod
+    def _to_rgb(img: np.ndarray, bgr: bool) -> np.ndarray:
+        if img.ndim == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if bgr else img
+
+
+FACE_DETECTORS = {
+    HaarFaceDetector.name: HaarFaceDetector,
+    MTCNNFaceDetector.name: MTCNNFaceDetector,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_face_detector(name: str = None) -> FaceDetector:
+    """Return a shared detector instance by name ("haar" | "mtcnn").
+
+    Instances are cached per backend so the face and fusion pipelines load each
+    detector once; each pipeline passes its own downscale factor to detect().
+    """
+    name = (name or settings.FACE_DETECTOR).lower()
+    if name not in FACE_DETECTORS:
+        raise ValueError(
+            f"Unknown face detector '{name}'. Available: {', '.join(FACE_DETECTORS)}"
+        )
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = FACE_DETECTORS[name]()
+        return _instances[name]
@@ -9,6 +9,7 @@ from pathlib import Path
 from app.core.logger import setup_logger
 import os
 from app.core.config import settings
+from app.models.face_detectors import get_face_detector
 
 logger = setup_logger(__name__)
 
@@ -29,13 +30,26 @@ class FaceModel:
 
         self.model = self._create_model() if not Path(settings.FACE_MODEL_PATH).exists() else self._load_model()
 
-        # Load the face detection cascade classifier
-        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
-        if self.face_cascade.empty():
-            logger.error("Error loading face cascade classifier")
-            raise ValueError("Could not load face cascade classifier")
-        logger.info("Face cascade classifier loaded successfully")
+        # Face detector mặc định (settings.FACE_DETECTOR), dùng chung qua registry
+        self.detector = get_face_detector()
+        logger.info(f"Face detector '{self.detector.name}' ready")
+
+    def _get_detector(self, name=None):
+        """Detector theo tên (query param) hoặc detector mặc định"""
+        if name is None:
+            return self.detector
+        return get_face_detector(name)
+
+    @staticmethod
+    def _clip_box(box, img_width, img_height):
+        """Box (left, top, right, bottom, score) -> int, giới hạn trong ảnh"""
+        left, top, right, bottom = (int(round(v)) for v in box[:4])
+        return (
+            max(0, left),
+            max(0, top),
+            min(img_width, right),
+            min(img_height, bottom),
+        )
         
     def _create_model(self):
         """Create the CNN model architecture"""
@@ -110,12 +124,13 @@ class FaceModel:
             logger.error(f"Error loading face model: {e}")
             raise
             
-    def detect_faces(self, img_array, include_cropped_base64=False):
+    def detect_faces(self, img_array, include_cropped_base64=False, detector=None):
         """Detect all faces in image and return their locations.
         
         Args:
             img_array: Input image as numpy array
             include_cropped_base64: If True, include base64 encoded cropped faces
+            detector: Face detector name ("haar" | "mtcnn"), default settings.FACE_DETECTOR
             
         Returns:
             dict with:
@@ -133,16 +148,8 @@ class FaceModel:
             # Get image dimensions
             img_height, img_width = img_bgr.shape[:2]
 
-            # Convert to grayscale for face detection
-            gray_img = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-
             # Detect faces
-            faces = self.face_cascade.detectMultiScale(
-                gray_img, 
-                scaleFactor=1.1, 
-                minNeighbors=5, 
-                minSize=(30, 30)
-            )
+            faces = self._get_detector(detector).detect(img_bgr, bgr=True, scale=settings.FACE_DETECT_SCALE)
 
             if len(faces) == 0:
                 logger.warning("No faces detected in the image")
@@ -154,11 +161,8 @@ class FaceModel:
 
             # Process each detected face
             detected_faces = []
-            for idx, (x, y, w, h) in enumerate(faces):
-                left = int(x)
-                top = int(y)
-                right = int(x + w)
-                bottom = int(y + h)
+            for idx, box in enumerate(faces):
+                left, top, right, bottom = self._clip_box(box, img_width, img_height)
                 
                 face_data = {
                     "face_id": idx + 1,
@@ -236,7 +240,7 @@ class FaceModel:
             logger.error(f"Error predicting emotion from face: {e}")
             raise
 
-    def predict(self, img_array):
+    def predict(self, img_array, detector=None):
         """Predict emotion from face image (legacy method - detects largest face and predicts)
         This method is kept for backward compatibility.
         """
@@ -251,28 +255,26 @@ class FaceModel:
             gray_img = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
 
             # Detect faces
-            faces = self.face_cascade.detectMultiScale(gray_img, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+            img_height, img_width = gray_img.shape[:2]
+            faces = self._get_detector(detector).detect(img_bgr, bgr=True, scale=settings.FACE_DETECT_SCALE)
+            faces = [self._clip_box(box, img_width, img_height) for box in faces]
+            faces = [f for f in faces if f[2] > f[0] and f[3] > f[1]]
 
             if len(faces) == 0:
                 logger.warning("No faces detected in the image")
                 return {"error": "No faces detected in the image"}
 
             # Find the largest face
-            largest_face = max(faces, key=lambda rect: rect[2] * rect[3])
-            x, y, w, h = largest_face
+            left, top, right, bottom = max(
+                faces, key=lambda b: (b[2] - b[0]) * (b[3] - b[1])
+            )
 
             # Crop the face
-            cropped_face = gray_img[y:y+h, x:x+w]
+            cropped_face = gray_img[top:bottom, left:right]
             
             # Predict emotion from cropped face
             result = self.predict_emotion_from_face(cropped_face)
 
-            # Convert face location to left/top/right/bottom for frontend
-            left = int(x)
-            top = int(y)
-            right = int(x + w)
-            bottom = int(y + h)
-
             # Add face location to result
             result["face_location"] = {
                 "left": left,
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+
+class ResultsFilter(BaseModel):
+    """Bộ lọc giống /results/query; time range là [start, end)"""
+    source: Optional[str] = None
+    trash: Optional[int] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    emotion: Optional[str] = None
+
+
+class BulkResultsRequest(BaseModel):
+    """Chọn result theo danh sách id hoặc theo bộ lọc (chỉ 1 trong 2)"""
+    ids: Optional[List[int]] = None
+    filter: Optional[ResultsFilter] = None
+
+
+class BulkResultsResponse(BaseModel):
+    """Response model for bulk trash / restore / delete"""
+    success: bool
+    affected: int
@@ -0,0 +1,134 @@
+import asyncio
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.db import (
+    begin_write,
+    results_table,
+    results_archive_table,
+    adjust_stats,
+    bump_results_version,
+    remember_results_version,
+    run_db,
+)
+from app.core.logger import setup_logger
+from app.core.result_events import publish_ids
+
+logger = setup_logger(__name__)
+
+
+def _compress(text: str | None) -> bytes | None:
+    return zlib.compress(text.encode("utf-8")) if text is not None else None
+
+
+def decompress(data: bytes | None) -> str | None:
+    return zlib.decompress(data).decode("utf-8") if data is not None else None
+
+
+def _archive_batch_sync(where, batch_size: int) -> int:
+    """
+    Chuyển tối đa batch_size result khớp `where` (id tăng dần) sang results_archive:
+    INSERT archive + trừ results_stats + DELETE trong 1 transaction ngắn.
+    Returns:
+        số row đã chuyển (0 = hết)
+    """
+    c = results_table.c
+    archived_at = datetime.now()
+    version_info = None
+    with begin_write() as conn:
+        rows = conn.execute(select(results_table).where(where).order_by(c.id).limit(batch_size)).fetchall()
+        if not rows:
+            return 0
+        conn.execute(
+            results_archive_table.insert(),
+            [
+                {
+                    "id": row.id,
+                    "source": row.source,
+                    "timestamp": row.timestamp,
+                    "trash": row.trash,
+                    "emotion": row.emotion,
+                    "confidence": row.confidence,
+                    "all_emotions": row.all_emotions,
+                    "model_name": row.model_name,
+                    "payload_z": _compress(row.payload),
+                    "metadata_z": _compress(row._mapping["metadata"]),
+                    "archived_at": archived_at,
+                }
+                for row in rows
+            ],
+        )
+        moved = c.id.in_([row.id for row in rows])
+        adjust_stats(conn, moved, -1)
+        conn.execute(results_table.delete().where(moved))
+        version_info = bump_results_version(conn)
+    remember_results_version(version_info)
+    # Với live feed, row đã archive không còn trong results
+    publish_ids("delete", [row.id for row in rows], len(rows))
+    return len(rows)
+
+
+def archive_where_sync(where, max_rows: int | None = None) -> int:
+    """
+    Archive mọi result khớp `where` theo batch RESULTS_ARCHIVE_BATCH row,
+    mỗi batch 1 transaction riêng để không giữ lock lâu.
+    Returns:
+        tổng số row đã chuyển
+    """
+    batch_size = settings.RESULTS_ARCHIVE_BATCH
+    total = 0
+    while max_rows is None or total < max_rows:
+        n = _archive_batch_sync(where, batch_size if max_rows is None else min(batch_size, max_rows - total))
+        total += n
+        if n < batch_size:
+            break
+    if total:
+        logger.info(f"Archived {total} results rows")
+    return total
+
+
+def archive_old_sync(days: int | None = None) -> int:
+    """Archive result có timestamp cũ hơn `days` ngày (mặc định RESULTS_ARCHIVE_AFTER_DAYS; 0 = bỏ qua)"""
+    days = settings.RESULTS_ARCHIVE_AFTER_DAYS if days is None else days
+    if not days:
+        return 0
+    cutoff = datetime.now() - timedelta(days=days)
+    return archive_where_sync(results_table.c.timestamp < cutoff)
+
+
+class ResultArchiver:
+    """Chạy archive_old_sync định kỳ mỗi RESULTS_ARCHIVE_INTERVAL_S giây (0 = tắt,
+    chỉ chạy bằng scripts/archive_results.py)."""
+
+    def __init__(self):
+        self.task = None
+
+    async def start(self):
+        if not (settings.RESULTS_ARCHIVE_INTERVAL_S and settings.RESULTS_ARCHIVE_AFTER_DAYS):
+            return
+        self.task = asyncio.create_task(self._run())
+        logger.info(
+            f"Result archiver started (after={settings.RESULTS_ARCHIVE_AFTER_DAYS}d, "
+            f"interval={settings.RESULTS_ARCHIVE_INTERVAL_S}s)"
+        )
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await run_db(archive_old_sync)
+            except Exception as e:
+                logger.error(f"Result archival failed: {e}")
+            await asyncio.sleep(settings.RESULTS_ARCHIVE_INTERVAL_S)
+
+
+result_archiver = ResultArchiver()
@@ -1,7 +1,7 @@
 import os
 import io
+import hashlib
 import pickle
-from pathlib import Path
 
 import numpy as np
 import librosa
@@ -10,7 +10,9 @@ from fastapi import UploadFile, HTTPException
 from app.core.config import settings
 from app.core.logger import setup_logger
 from app.utils.image_utils import save_upload_file
+from app.utils.upload_utils import spool_upload
 from app.core.db import save_result
+from app.core.cache import ResultCache, weights_fingerprint
 
 os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
@@ -39,6 +41,20 @@ class AudioService:
         self.offset = 0.6
         self.target_sr = 22050
 
+        audio_dir = settings.MODEL_DIR / "audio"
+        self.cache = ResultCache(
+            "audio",
+            weights_fingerprint(
+                [
+                    audio_dir / "CNN_model.json",
+                    audio_dir / "best_model1_weights.h5",
+                    audio_dir / "scaler2.pickle",
+                    audio_dir / "encoder2.pickle",
+                ],
+                extra=f"sr={self.target_sr},duration={self.duration},offset={self.offset}",
+            ),
+        )
+
     # ------------------------------------------------------------------ #
     # 1. Load model + scaler + encoder
     # ------------------------------------------------------------------ #
@@ -169,8 +185,10 @@ class AudioService:
             if file.content_type not in settings.ALLOWED_AUDIO_TYPES:
                 raise HTTPException(status_code=400, detail=f"Audio type not allowed: {file.content_type}")
 
-            saved = await save_upload_file(file, "audios")
+            saved = await save_upload_file(file, "audios", max_size=settings.MAX_AUDIO_UPLOAD_SIZE)
             return {"message": "File uploaded successfully", "file_path": str(saved)}
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error saving audio file: {e}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -185,51 +203,81 @@ class AudioService:
         try:
             model = self._load_model()
 
-            # đọc bytes
+            # UploadFile được stream xuống file tạm (giới hạn kích thước), bytes giữ nguyên
+            spooled = None
             if hasattr(audio_input, "read"):
-                logger.info(f"Reading WAV from UploadFile: {getattr(audio_input, 'filename', 'unknown')}")
-                contents = await audio_input.read()
+                logger.info(f"Spooling audio from UploadFile: {getattr(audio_input, 'filename', 'unknown')}")
+                spooled = await spool_upload(audio_input, settings.MAX_AUDIO_UPLOAD_SIZE)
+                audio_source = str(spooled.path)
             elif isinstance(audio_input, (bytes, bytearray)):
                 logger.info(f"Reading WAV from bytes: {len(audio_input)} bytes")
-                contents = bytes(audio_input)
+                if len(audio_input) > settings.MAX_AUDIO_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="Audio payload too large")
+                audio_source = io.BytesIO(bytes(audio_input))
             else:
                 raise HTTPException(status_code=400, detail=f"Unsupported audio input type: {type(audio_input)}")
 
-            # 🎯 DÙNG LIBROSA.GIỐNG COLAB
-            try:
-                audio_buffer = io.BytesIO(contents)
-                # sr=22050 (target_sr), duration & offset giống hệt notebook
-                data, sr = librosa.load(
-                    audio_buffer,
-                    sr=self.target_sr,
-                    duration=self.duration,
-                    offset=self.offset,
+            # Cache theo nội dung file + version model: file gửi lại không phải tính lại
+            if spooled is not None:
+                content_hash = spooled.sha256
+            else:
+                content_hash = hashlib.sha256(audio_source.getbuffer()).hexdigest()
+            cached = self.cache.get(content_hash)
+
+            if cached is not None:
+                logger.info(f"Audio result cache hit: {content_hash[:12]}")
+                if spooled is not None:
+                    spooled.cleanup()
+                predicted_emotion = cached["emotion"]
+                confidence = cached["confidence"]
+                all_emotions = cached["all_emotions"]
+            else:
+                # 🎯 DÙNG LIBROSA.GIỐNG COLAB
+                try:
+                    # sr=22050 (target_sr), duration & offset giống hệt notebook
+                    data, sr = librosa.load(
+                        audio_source,
+                        sr=self.target_sr,
+                        duration=self.duration,
+                        offset=self.offset,
+                    )
+                    logger.info(f"librosa.load -> {data.shape[0]} samples, sr={sr}")
+                except Exception as e:
+                    logger.error(f"Error reading WAV with librosa: {e}")
+                    raise HTTPException(status_code=400, detail=f"Cannot read WAV file: {e}")
+                finally:
+                    if spooled is not None:
+                        spooled.cleanup()
+
+                # trích features giống get_predict_feat
+                feat_arr = self._get_predict_feat_from_waveform(data, sr)
+
+                # predict
+                preds = model.predict(feat_arr)
+                preds = np.asarray(preds).squeeze()
+                logger.info(f"Raw predictions shape: {preds.shape}, values: {preds}")
+
+                # dùng encoder đúng thứ tự label
+                if self.encoder is not None and hasattr(self.encoder, "categories_"):
+                    emotion_labels = list(self.encoder.categories_[0])
+
+                    preds_2d = preds.reshape(1, -1)
+                    y_pred = self.encoder.inverse_transform(preds_2d)
+                    predicted_emotion = y_pred[0][0]
+
+                    all_emotions = {emotion_labels[i]: float(preds[i]) for i in range(len(emotion_labels))}
+                    confidence = float(preds[emotion_labels.index(predicted_emotion)])
+
+                logger.info(f"Predicted emotion: {predicted_emotion}, confidence: {confidence}")
+
+                self.cache.put(
+                    content_hash,
+                    {
+                        "emotion": predicted_emotion,
+                        "confidence": confidence,
+                        "all_emotions": all_emotions,
+                    },
                 )
-                logger.info(f"librosa.load -> {data.shape[0]} samples, sr={sr}")
-            except Exception as e:
-                logger.error(f"Error reading WAV with librosa: {e}")
-                raise HTTPException(status_code=400, detail=f"Cannot read WAV file: {e}")
-
-            # trích features giống get_predict_feat
-            feat_arr = self._get_predict_feat_from_waveform(data, sr)
-
-            # predict
-            preds = model.predict(feat_arr)
-            preds = np.asarray(preds).squeeze()
-            logger.info(f"Raw predictions shape: {preds.shape}, values: {preds}")
-
-            # dùng encoder đúng thứ tự label
-            if self.encoder is not None and hasattr(self.encoder, "categories_"):
-                emotion_labels = list(self.encoder.categories_[0])
-
-                preds_2d = preds.reshape(1, -1)
-                y_pred = self.encoder.inverse_transform(preds_2d)
-                predicted_emotion = y_pred[0][0]
-
-                all_emotions = {emotion_labels[i]: float(preds[i]) for i in range(len(emotion_labels))}
-                confidence = float(preds[emotion_labels.index(predicted_emotion)])
-
-            logger.info(f"Predicted emotion: {predicted_emotion}, confidence: {confidence}")
 
             # Try to save result to DB (non-fatal) and return analysis id when available
             analysis_id = None
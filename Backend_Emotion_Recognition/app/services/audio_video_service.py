@@ -1,18 +1,23 @@
 import torch
 import cv2
 import numpy as np
-import torchaudio
 import torchaudio.transforms as T
+import asyncio
 import subprocess
-import tempfile
-import os
-from pathlib import Path
+import time
+from functools import partial
 from fastapi import UploadFile, HTTPException
-from facenet_pytorch import MTCNN  
+from fastapi.concurrency import run_in_threadpool
+from facenet_pytorch import extract_face, fixed_image_standardization
 
 from app.models.audio_video_model import AudioVideoModel
+from app.models.face_detectors import FaceDetector, get_face_detector
+from app.core.config import settings
 from app.core.logger import setup_logger
 from app.core.db import save_result
+from app.core.cache import ResultCache, weights_fingerprint
+from app.utils.upload_utils import spool_upload
+from app.utils.video_utils import probe_duration
 
 logger = setup_logger(__name__)
 
@@ -32,6 +37,7 @@ VIDEO_CONFIG = {
 }
 
 TARGET_MEL_T = 320  # ~3.2s @ 10ms hop
+WINDOW_S = TARGET_MEL_T * AUDIO_CONFIG["hop_length"] / AUDIO_CONFIG["sample_rate"]  # 3.2s
 
 
 class AudioVideoService:
@@ -41,13 +47,10 @@ class AudioVideoService:
         self.model = AudioVideoModel()
         self.device = self.model.device
 
-        self.mtcnn = MTCNN(
-            image_size=VIDEO_CONFIG["frame_size"],
-            margin=20,
-            device=self.device,
-            post_process=True,
-            selection_method="probability",
-        )
+        # Face detector mặc định (settings.FUSION_FACE_DETECTOR), dùng chung qua registry;
+        # crop + chuẩn hoá giống MTCNN(image_size=224, margin=20, post_process=True)
+        self.detector = self._get_detector()
+        self.face_margin = 20
 
         # Mel-spectrogram transform (y như notebook)
         self.mel_spec = T.MelSpectrogram(
@@ -60,58 +63,95 @@ class AudioVideoService:
         )
         self.amp_to_db = T.AmplitudeToDB(stype="power")
 
-    async def predict(self, video_file: UploadFile):
+        # Result cache: version đổi khi weights hoặc config ảnh hưởng output thay đổi
+        self.cache = ResultCache(
+            "fusion",
+            weights_fingerprint(
+                [settings.FUSION_MODEL_PATH, settings.FUSION_ARTIFACT_PATH],
+                extra=(
+                    f"detect_scale={settings.FUSION_DETECT_SCALE},"
+                    f"detector={settings.FUSION_FACE_DETECTOR},"
+                    f"dedup={settings.FUSION_FRAME_DEDUP}:{settings.FUSION_DEDUP_MAX_DISTANCE},"
+                    f"bf16={self.model.use_bf16}"
+                ),
+            ),
+        )
+
+    def _get_detector(self, name: str = None) -> FaceDetector:
+        """Face detector theo tên (query param) hoặc settings.FUSION_FACE_DETECTOR"""
+        try:
+            return get_face_detector(name or settings.FUSION_FACE_DETECTOR)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def predict(self, video_file: UploadFile, detector: str = None):
         """
         Main prediction endpoint
         """
+        detector = self._get_detector(detector)
+        # 1. Stream file xuống file tạm (giới hạn kích thước)
+        spooled = await spool_upload(
+            video_file, settings.MAX_VIDEO_UPLOAD_SIZE, suffix=".mp4"
+        )
         try:
-            # 1. Save file tạm thời
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_video:
-                content = await video_file.read()
-                tmp_video.write(content)
-                tmp_video_path = tmp_video.name
-
-            logger.info(f"Processing video: {video_file.filename}")
-
-            # 2. Preprocess video -> faces
-            try:
-                video_tensor = await self._preprocess_video(tmp_video_path)
-            except Exception as e:
-                logger.error(f"Video preprocessing failed: {e}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Video preprocessing failed: {str(e)}",
-                )
-
-            # 3. Preprocess audio từ video file
-            try:
-                audio_tensor = await self._preprocess_audio_from_video(tmp_video_path)
-            except Exception as e:
-                logger.error(f"Audio preprocessing failed: {e}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Audio preprocessing failed: {str(e)}",
-                )
-
-            # 4. Inference
-            result = self.model.predict(video_tensor, audio_tensor)
-
-            # Cleanup
-            try:
-                os.remove(tmp_video_path)
-            except Exception:
-                pass
+            return await self.predict_file(
+                str(spooled.path),
+                getattr(video_file, "filename", None),
+                content_hash=spooled.sha256,
+                detector=detector,
+            )
+        finally:
+            spooled.cleanup()
+
+    async def predict_file(
+        self,
+        video_path: str,
+        filename: str = None,
+        content_hash: str = None,
+        detector: FaceDetector = None,
+    ):
+        """
+        Predict từ video đã có trên disk (dùng cho request đồng bộ và job queue)
+        content_hash: SHA-256 của file, dùng làm key cho result cache
+        detector: face detector (mặc định self.detector)
+        """
+        try:
+            logger.info(f"Processing video: {filename}")
+            detector = detector or self.detector
+
+            # Chỉ cache được khi sampling deterministic (không jitter);
+            # detector khác mặc định có kết quả riêng
+            if not settings.FUSION_DETERMINISTIC_SAMPLING:
+                content_hash = None
+            elif content_hash and detector is not self.detector:
+                content_hash = f"{content_hash}-{detector.name}"
+            cached = self.cache.get(content_hash)
+            if cached is not None:
+                logger.info(f"Fusion result cache hit: {content_hash[:12]}")
+                return await self._save_and_attach_id(cached, filename)
+
+            # 2+3. Preprocess video -> faces và audio -> mel song song trên worker threads
+            timings = {}
+            t0 = time.perf_counter()
+            video_tensor, audio_tensor = await asyncio.gather(
+                self._run_branch(
+                    "video", partial(self._preprocess_video, detector=detector), video_path, timings
+                ),
+                self._run_branch("audio", self._preprocess_audio_from_video, video_path, timings),
+            )
+            timings["preprocess"] = (time.perf_counter() - t0) * 1000
 
-            # Try to save result to DB (non-fatal) and attach analysis_id if available
-            try:
-                filename = getattr(video_file, "filename", None)
-                pk = await save_result("audio_video", result, {"filename": filename, "model_name": "fusion_net"})
-                if pk is not None and isinstance(result, dict):
-                    result["analysis_id"] = int(pk)
-            except Exception as e:
-                logger.warning(f"Failed to save audio_video result to DB: {e}")
+            # 4. Inference trên worker thread: không block event loop (poll /jobs, SSE, job khác)
+            t1 = time.perf_counter()
+            result = await run_in_threadpool(self.model.predict, video_tensor, audio_tensor)
+            timings["inference"] = (time.perf_counter() - t1) * 1000
+            logger.info(
+                "[TIMING] video={video:.1f}ms audio={audio:.1f}ms "
+                "preprocess={preprocess:.1f}ms inference={inference:.1f}ms".format(**timings)
+            )
 
-            return result
+            self.cache.put(content_hash, result)
+            return await self._save_and_attach_id(result, filename)
 
         except HTTPException:
             raise
@@ -121,10 +161,34 @@ class AudioVideoService:
                 status_code=500, detail=f"Prediction error: {str(e)}"
             )
 
-    async def _preprocess_video(self, video_path: str) -> torch.Tensor:
+    async def _save_and_attach_id(self, result: dict, filename: str) -> dict:
+        """Try to save result to DB (non-fatal) and attach analysis_id if available"""
+        try:
+            pk = await save_result("audio_video", result, {"filename": filename, "model_name": "fusion_net"})
+            if pk is not None and isinstance(result, dict):
+                result["analysis_id"] = int(pk)
+        except Exception as e:
+            logger.warning(f"Failed to save audio_video result to DB: {e}")
+        return result
+
+    async def _run_branch(self, name: str, fn, video_path: str, timings: dict):
+        """Chạy 1 nhánh preprocessing trên threadpool, ghi lại thời gian (ms)"""
+        t0 = time.perf_counter()
+        try:
+            return await run_in_threadpool(fn, video_path)
+        except Exception as e:
+            logger.error(f"{name.capitalize()} preprocessing failed: {e}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"{name.capitalize()} preprocessing failed: {str(e)}",
+            )
+        finally:
+            timings[name] = (time.perf_counter() - t0) * 1000
+
+    def _preprocess_video(self, video_path: str, detector: FaceDetector = None) -> torch.Tensor:
         """
         Video preprocessing: read frames -> detect faces -> crop -> normalize
-        PIPELINE GIỐNG NHẤT CÓ THỂ VỚI NOTEBOOK (MTCNN)
+        PIPELINE GIỐNG NHẤT CÓ THỂ VỚI NOTEBOOK (MTCNN mặc định)
         Returns:
             [1, 16, 3, 224, 224] tensor
         """
@@ -139,54 +203,75 @@ class AudioVideoService:
 
         # 2. Uniform sampling: chọn 16 frames đều từ video
         frames = self._uniform_sample(
-        frames, T=VIDEO_CONFIG["num_frames"], jitter=True)
+            frames,
+            T=VIDEO_CONFIG["num_frames"],
+            jitter=not settings.FUSION_DETERMINISTIC_SAMPLING,
+        )
         logger.info(f"[VIDEO] Sampled {len(frames)} uniform frames")
 
-        # 3. Face detection & crop bằng MTCNN (giống hàm crop_faces_tensor)
-        face_tensors = []
-        num_faces_detected = 0
+        # 3. Face detection & crop (giống hàm crop_faces_tensor)
+        faces_tensor = self._build_video_tensor([frames], detector)
 
-        for i, frame in enumerate(frames):
-            # frame: RGB [H,W,3] uint8
-            try:
-                with torch.no_grad():
-                    face = self.mtcnn(frame)  # [3,224,224] hoặc None
-            except Exception as e:
-                logger.debug(f"MTCNN error on frame {i}: {e}")
-                face = None
+        logger.info(
+            f"[VIDEO] SUCCESS: tensor shape={faces_tensor.shape} (dtype={faces_tensor.dtype})"
+        )
+        return faces_tensor
 
+    def _build_video_tensor(self, clips: list, detector: FaceDetector = None) -> torch.Tensor:
+        """
+        Detect + crop faces cho B clip (mỗi clip T frames RGB) bằng 1 lần gọi detector,
+        ghi thẳng vào tensor cấp phát sẵn.
+        Returns:
+            [B, T, 3, 224, 224] tensor
+        """
+        size = VIDEO_CONFIG["frame_size"]
+        B, T = len(clips), len(clips[0])
+        faces_tensor = torch.empty((B, T, 3, size, size), dtype=torch.float32)
+        frames = [frame for clip in clips for frame in clip]
+        faces = self._detect_faces_batched(frames, detector or self.detector)
+        num_faces_detected = 0
+
+        for i, (frame, face) in enumerate(zip(frames, faces)):
+            b, t = divmod(i, T)
             if face is None:
                 # fallback giống notebook: resize full frame, scale 0-1
-                resized = cv2.resize(
-                    frame,
-                    (VIDEO_CONFIG["frame_size"], VIDEO_CONFIG["frame_size"]),
-                )
-                t = (
-                    torch.from_numpy(resized.transpose(2, 0, 1))
-                    .float()
-                    / 255.0
-                )  # [3,224,224]
+                resized = cv2.resize(frame, (size, size))
+                faces_tensor[b, t].copy_(torch.from_numpy(resized).permute(2, 0, 1))
+                faces_tensor[b, t].div_(255.0)
                 logger.debug(f"[VIDEO] No face detected on frame {i}, using full frame")
             else:
                 num_faces_detected += 1
-                # MTCNN trả về tensor [3,224,224], đã chuẩn hoá
-                t = face.float()
-
-            face_tensors.append(t.unsqueeze(0))  # [1,3,224,224]
+                # crop tensor [3,224,224], đã chuẩn hoá
+                faces_tensor[b, t].copy_(face)
 
         logger.info(
             f"[VIDEO] Face detection: {num_faces_detected}/{len(frames)} frames with faces"
         )
+        return faces_tensor
 
-        # 4. Stack thành [T,3,224,224] giống file .pt ở Colab
-        faces_tensor = torch.cat(face_tensors, dim=0)  # [T,3,224,224]
-        # 5. Add batch dimension: [1,T,3,224,224]
-        faces_tensor = faces_tensor.unsqueeze(0)
+    def _detect_faces_batched(self, frames: list, detector: FaceDetector) -> list:
+        """
+        Detect faces trên tất cả frames bằng 1 lần gọi detector.
+        Detection chạy trên frames đã downscale (settings.FUSION_DETECT_SCALE),
+        còn crop lấy từ frame full resolution (box có score cao nhất, margin 20).
+        Returns:
+            list gồm tensor [3,224,224] hoặc None cho mỗi frame
+        """
+        size = VIDEO_CONFIG["frame_size"]
+        try:
+            batch_boxes = detector.detect_batch(frames, scale=settings.FUSION_DETECT_SCALE)
+            faces = []
+            for frame, boxes in zip(frames, batch_boxes):
+                if not boxes:
+                    faces.append(None)
+                    continue
+                face = extract_face(frame, boxes[0][:4], size, self.face_margin)
+                faces.append(fixed_image_standardization(face))
+        except Exception as e:
+            logger.debug(f"Face detection batch error ({detector.name}): {e}")
+            return [None] * len(frames)
 
-        logger.info(
-            f"[VIDEO] SUCCESS: tensor shape={faces_tensor.shape} (dtype={faces_tensor.dtype})"
-        )
-        return faces_tensor
+        return faces
 
     def _read_all_frames(self, video_path: str) -> list:
         """Đọc tất cả frames từ video"""
@@ -226,89 +311,324 @@ class AudioVideoService:
 
         return [frames[i] for i in idx]
 
-    async def _preprocess_audio_from_video(self, video_path: str) -> torch.Tensor:
+    def _preprocess_audio_from_video(self, video_path: str) -> torch.Tensor:
         """
-        Extract audio từ video file -> WAV 16kHz -> Mel-spectrogram
-        EXACT match với notebook pipeline
+        Extract audio từ video -> PCM 16kHz (in-memory) -> Mel-spectrogram
+        Chỉ decode cửa sổ trung tâm (TARGET_MEL_T frames + STFT padding)
         Returns:
             [1, 1, 80, 320] tensor
         """
         logger.info("Preprocessing audio from video...")
 
-        # Extract audio từ video thành WAV 16kHz
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_wav:
-            wav_path = tmp_wav.name
+        sr = AUDIO_CONFIG["sample_rate"]
+        hop = AUDIO_CONFIG["hop_length"]
+        n_fft = AUDIO_CONFIG["n_fft"]
 
-        try:
-            # FFmpeg: extract audio at 16kHz mono (EXACT như notebook)
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-v",
-                "error",
-                "-i",
-                video_path,
-                "-ac",
-                "1",  # mono
-                "-ar",
-                str(AUDIO_CONFIG["sample_rate"]),  # 16kHz
-                wav_path,
-            ]
-
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, timeout=30
-            )
-            if result.returncode != 0:
-                raise RuntimeError(f"FFmpeg error: {result.stderr}")
+        # Cửa sổ cần decode: TARGET_MEL_T frames + n_fft//2 padding mỗi bên
+        window_s = ((TARGET_MEL_T - 1) * hop + 2 * (n_fft // 2)) / sr
+        duration = probe_duration(video_path)
 
-            logger.info(f"Audio extracted to: {wav_path}")
+        if duration is not None and duration > window_s:
+            start_s = (duration - window_s) / 2
+            waveform = self._decode_audio_pcm(video_path, start_s, window_s)
+        else:
+            waveform = self._decode_audio_pcm(video_path)
 
-            # ==== EXACT notebook pipeline ====
-            waveform, sr = torchaudio.load(wav_path)  # [C, T]
+        if waveform.shape[-1] == 0:
+            raise RuntimeError("No audio samples decoded from video")
 
-            # Resample nếu cần
-            if sr != AUDIO_CONFIG["sample_rate"]:
-                resampler = T.Resample(sr, AUDIO_CONFIG["sample_rate"])
-                waveform = resampler(waveform)
+        logger.info(
+            f"Audio decoded in-memory: {waveform.shape[-1]} samples "
+            f"(duration={duration}, window={window_s:.3f}s)"
+        )
 
-            # Ensure mono
-            if waveform.shape[0] > 1:
-                waveform = waveform.mean(dim=0, keepdim=True)  # [1, T]
+        # Mel-spectrogram
+        mel = self.mel_spec(waveform)  # [1, n_mels=80, Tm]
+        mel_db = self.amp_to_db(mel).squeeze(0).float()  # [80, Tm]
 
-            # Mel-spectrogram
-            mel = self.mel_spec(waveform)  # [1, n_mels=80, Tm]
-            mel_db = self.amp_to_db(mel).squeeze(0).float()  # [80, Tm]
+        mel_tensor = self._normalize_mel(mel_db)
 
-            logger.debug(
-                f"Mel-spectrogram shape before CMVN: {mel_db.shape}, "
-                f"mean={mel_db.mean():.3f}, std={mel_db.std():.3f}"
-            )
+        logger.info(
+            f"Audio tensor: shape={mel_tensor.shape}, "
+            f"mean={mel_tensor[0,0].mean():.6f}, std={mel_tensor[0,0].std():.6f}"
+        )
+        return mel_tensor
 
-            # CMVN: per-sample normalization 
-            mel_db = (mel_db - mel_db.mean()) / (mel_db.std() + 1e-6)
+    def _normalize_mel(self, mel_db: torch.Tensor) -> torch.Tensor:
+        """
+        CMVN + crop/pad về TARGET_MEL_T
+        mel_db: [80, Tm] -> [1, 1, 80, 320]
+        """
+        logger.debug(
+            f"Mel-spectrogram shape before CMVN: {mel_db.shape}, "
+            f"mean={mel_db.mean():.3f}, std={mel_db.std():.3f}"
+        )
 
-            # Crop or pad to TARGET_MEL_T 
-            mel_db = self._crop_or_pad_mel(mel_db, TARGET_MEL_T, mode="center")
+        # CMVN: per-sample normalization
+        mel_db = (mel_db - mel_db.mean()) / (mel_db.std() + 1e-6)
 
-            #  KHÔNG re-normalize lần 2 
-            logger.debug(
-                f"Mel-spectrogram after crop: mean={mel_db.mean():.6f}, std={mel_db.std():.6f}"
-            )
+        # Crop or pad to TARGET_MEL_T
+        mel_db = self._crop_or_pad_mel(mel_db, TARGET_MEL_T, mode="center")
 
-            # [80, 320] -> [1,1,80,320]
-            mel_tensor = mel_db.unsqueeze(0).unsqueeze(0)
+        #  KHÔNG re-normalize lần 2
+        logger.debug(
+            f"Mel-spectrogram after crop: mean={mel_db.mean():.6f}, std={mel_db.std():.6f}"
+        )
 
-            logger.info(
-                f"Audio tensor: shape={mel_tensor.shape}, "
-                f"mean={mel_tensor[0,0].mean():.6f}, std={mel_tensor[0,0].std():.6f}"
+        # [80, 320] -> [1,1,80,320]
+        return mel_db.unsqueeze(0).unsqueeze(0)
+
+    def _decode_audio_pcm(
+        self, video_path: str, start_s: float = None, duration_s: float = None
+    ) -> torch.Tensor:
+        """
+        Decode audio track bằng ffmpeg qua pipe (không tạo file tạm)
+        -> mono float32 16kHz. Nếu có start_s/duration_s thì chỉ decode đoạn đó.
+        Returns:
+            [1, N] waveform tensor
+        """
+        cmd = ["ffmpeg", "-v", "error"]
+        if start_s is not None:
+            cmd += ["-ss", f"{start_s:.3f}"]
+        cmd += ["-i", video_path]
+        if duration_s is not None:
+            cmd += ["-t", f"{duration_s:.3f}"]
+        cmd += [
+            "-vn",
+            "-ac",
+            "1",  # mono
+            "-ar",
+            str(AUDIO_CONFIG["sample_rate"]),  # 16kHz
+            "-f",
+            "f32le",
+            "pipe:1",
+        ]
+
+        result = subprocess.run(cmd, capture_output=True, timeout=30)
+        if result.returncode != 0:
+            raise RuntimeError(f"FFmpeg error: {result.stderr.decode(errors='replace')}")
+
+        samples = np.frombuffer(result.stdout, dtype=np.float32)
+        return torch.from_numpy(samples.copy()).unsqueeze(0)  # [1, N]
+
+    # ------------------------------------------------------------------ #
+    # Long-video timeline mode
+    # ------------------------------------------------------------------ #
+    async def predict_timeline(self, video_file: UploadFile, hop_s: float = None, detector: str = None):
+        """
+        Long-video mode: chia video thành các cửa sổ 3.2s (liên tiếp hoặc chồng lấn),
+        predict theo batch B cửa sổ và stream kết quả khi từng batch xong.
+        Giới hạn FUSION_TIMELINE_MAX_WINDOWS cửa sổ và FUSION_TIMELINE_MAX_DURATION_S giây:
+        nếu ffprobe đọc được duration và vượt giới hạn thì raise HTTPException 400 ngay tại đây
+        (trước khi stream); không đọc được thì stream dừng ở giới hạn.
+        Returns:
+            (async generator các event dict (start / window / end / error),
+             cleanup xóa file tạm — gọi sau khi response kết thúc, kể cả khi generator chưa chạy)
+        """
+        detector = self._get_detector(detector)
+        hop_s = max(hop_s or WINDOW_S, settings.FUSION_TIMELINE_MIN_HOP_S)
+        spooled = await spool_upload(
+            video_file, settings.MAX_VIDEO_UPLOAD_SIZE, suffix=".mp4"
+        )
+        duration = await run_in_threadpool(probe_duration, str(spooled.path))
+        if duration and duration > settings.FUSION_TIMELINE_MAX_DURATION_S:
+            spooled.cleanup()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Video is {duration:.0f}s long (max {settings.FUSION_TIMELINE_MAX_DURATION_S:.0f}s for timeline mode)",
+            )
+        if duration and duration / hop_s > settings.FUSION_TIMELINE_MAX_WINDOWS:
+            spooled.cleanup()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Timeline would have {int(duration / hop_s)} windows "
+                f"(max {settings.FUSION_TIMELINE_MAX_WINDOWS}); use a larger hop_s",
             )
-            return mel_tensor
+        logger.info(f"Processing video timeline: {video_file.filename}")
+        events = self._timeline_events(
+            spooled, hop_s, getattr(video_file, "filename", None), detector
+        )
+        return events, spooled.cleanup
+
+    async def _timeline_events(self, spooled, hop_s: float, filename: str, detector: FaceDetector):
+        video_path = str(spooled.path)
+        windows = self._iter_video_windows(video_path, WINDOW_S, hop_s)
+        # Audio decode 1 lần cho cả track, chạy song song với video decode; chỉ decode phần
+        # các cửa sổ có thể phủ (không quá FUSION_TIMELINE_MAX_DURATION_S) để giới hạn bộ nhớ PCM
+        max_s = min(
+            settings.FUSION_TIMELINE_MAX_DURATION_S,
+            (settings.FUSION_TIMELINE_MAX_WINDOWS - 1) * hop_s + WINDOW_S,
+        )
+        audio_task = asyncio.ensure_future(
+            run_in_threadpool(self._full_track_mel, video_path, max_s)
+        )
+        try:
+            yield {"type": "start", "window_s": WINDOW_S, "hop_s": hop_s}
+
+            timeline = []
+            done = False
+            while not done:
+                batch = []
+                while len(batch) < settings.FUSION_TIMELINE_BATCH:
+                    # duration không probe được: vẫn dừng ở FUSION_TIMELINE_MAX_WINDOWS
+                    if len(timeline) + len(batch) >= settings.FUSION_TIMELINE_MAX_WINDOWS:
+                        logger.warning(f"Timeline truncated at {settings.FUSION_TIMELINE_MAX_WINDOWS} windows")
+                        done = True
+                        break
+                    window = await run_in_threadpool(next, windows, None)
+                    if window is None or window["start"] >= max_s:
+                        done = True
+                        break
+                    batch.append(window)
+                if not batch:
+                    break
+
+                mel_db = await audio_task
+                video_tensor = await run_in_threadpool(
+                    self._build_video_tensor, [w["frames"] for w in batch], detector
+                )
+                audio_tensor = torch.cat([self._window_mel(mel_db, w["start"]) for w in batch])
+                results = await run_in_threadpool(
+                    self.model.predict_batch, video_tensor, audio_tensor
+                )
 
+                for w, r in zip(batch, results):
+                    event = {
+                        "type": "window",
+                        "index": len(timeline),
+                        "start": round(w["start"], 3),
+                        "end": round(w["end"], 3),
+                        **r,
+                    }
+                    timeline.append(event)
+                    yield event
+
+            if not timeline:
+                raise ValueError("[ERROR] No frames extracted from video")
+
+            summary = self._summarize_timeline(timeline)
+            try:
+                pk = await save_result(
+                    "audio_video",
+                    summary,
+                    {
+                        "filename": filename,
+                        "model_name": "fusion_net",
+                        "mode": "timeline",
+                        "windows": len(timeline),
+                        "hop_s": hop_s,
+                    },
+                )
+                if pk is not None:
+                    summary["analysis_id"] = int(pk)
+            except Exception as e:
+                logger.warning(f"Failed to save audio_video timeline result to DB: {e}")
+
+            yield {"type": "end", "windows": len(timeline), **summary}
+
+        except Exception as e:
+            logger.error(f"Timeline prediction error: {e}")
+            yield {"type": "error", "detail": str(e)}
         finally:
+            audio_task.cancel()
             try:
-                os.remove(wav_path)
-            except Exception:
-                pass
+                # Client ngắt khi next(windows) còn chạy trên threadpool -> ValueError
+                # "generator already executing"; không được bỏ qua cleanup
+                windows.close()
+            except Exception as e:
+                logger.debug(f"Could not close timeline window iterator: {e}")
+            finally:
+                spooled.cleanup()
+
+    def _iter_video_windows(self, video_path: str, window_s: float, hop_s: float):
+        """
+        Decode video 1 lần (tuần tự) và yield từng cửa sổ ngay khi đủ frame.
+        Mỗi cửa sổ chỉ giữ T frame gần nhất với T mốc thời gian đều nhau,
+        nên bộ nhớ không phụ thuộc độ dài video.
+        Yields:
+            dict {start, end, frames: list T frame RGB}
+        """
+        T_ = VIDEO_CONFIG["num_frames"]
+        cap = cv2.VideoCapture(video_path)
+        open_windows = []
+        next_index = 0
+        last_t = 0.0
+        try:
+            while cap.grab():
+                t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+                # Mở các cửa sổ mới bắt đầu trước t
+                while next_index * hop_s <= t:
+                    start = next_index * hop_s
+                    open_windows.append({
+                        "start": start,
+                        "end": start + window_s,
+                        "targets": start + (np.arange(T_) + 0.5) * window_s / T_,
+                        "dist": np.full(T_, np.inf),
+                        "frames": [None] * T_,
+                    })
+                    next_index += 1
+
+                # Đóng các cửa sổ đã qua
+                while open_windows and t >= open_windows[0]["end"]:
+                    w = open_windows.pop(0)
+                    if w["frames"][0] is not None:
+                        yield w
+
+                # Gán frame cho các mốc thời gian mà nó gần hơn
+                frame = None
+                for w in open_windows:
+                    d = np.abs(w["targets"] - t)
+                    better = d < w["dist"]
+                    if not better.any():
+                        continue
+                    if frame is None:
+                        ok, bgr = cap.retrieve()
+                        if not ok:
+                            break
+                        frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+                    w["dist"][better] = d[better]
+                    for k in np.flatnonzero(better):
+                        w["frames"][k] = frame
+                last_t = t
+
+            # EOF: chỉ giữ cửa sổ dở dang sớm nhất để phủ phần đuôi video
+            if open_windows and open_windows[0]["frames"][0] is not None:
+                w = open_windows[0]
+                w["end"] = min(w["end"], last_t)
+                yield w
+        finally:
+            cap.release()
+
+    def _full_track_mel(self, video_path: str, max_s: float = None) -> torch.Tensor:
+        """Decode audio track (in-memory, tối đa max_s giây đầu) -> mel dB [80, Tm], chưa CMVN"""
+        waveform = self._decode_audio_pcm(video_path, duration_s=max_s)
+        if waveform.shape[-1] == 0:
+            raise RuntimeError("No audio samples decoded from video")
+        mel = self.mel_spec(waveform)
+        return self.amp_to_db(mel).squeeze(0).float()
+
+    def _window_mel(self, mel_db: torch.Tensor, start_s: float) -> torch.Tensor:
+        """Cắt mel của cửa sổ bắt đầu tại start_s -> [1, 1, 80, 320]"""
+        frames_per_s = AUDIO_CONFIG["sample_rate"] / AUDIO_CONFIG["hop_length"]
+        s = int(round(start_s * frames_per_s))
+        window = mel_db[:, s : s + TARGET_MEL_T]
+        if window.shape[-1] == 0:
+            return torch.zeros(1, 1, AUDIO_CONFIG["n_mels"], TARGET_MEL_T)
+        return self._normalize_mel(window)
+
+    def _summarize_timeline(self, timeline: list) -> dict:
+        """Kết quả tổng hợp: trung bình xác suất của tất cả cửa sổ"""
+        labels = list(timeline[0]["all_emotions"].keys())
+        all_emotions = {
+            k: float(np.mean([w["all_emotions"][k] for w in timeline])) for k in labels
+        }
+        emotion = max(all_emotions, key=all_emotions.get)
+        return {
+            "emotion": emotion,
+            "confidence": all_emotions[emotion],
+            "all_emotions": all_emotions,
+        }
 
     def _crop_or_pad_mel(
         self, mel: torch.Tensor, target_T: int = 320, mode: str = "center"
@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.db import engine, results_table, results_archive_table, run_db
+from app.core.logger import setup_logger
+from app.services.results_service import ResultFilters, ITEM_COLUMNS
+
+logger = setup_logger(__name__)
+
+EXPORT_COLUMNS = ITEM_COLUMNS + [results_table.c.model_name]
+EXPORT_FIELDS = [col.name for col in EXPORT_COLUMNS]
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _export_row(row) -> dict:
+    return {
+        "id": row.id,
+        "source": row.source,
+        "timestamp": row.timestamp,
+        "emotion": row.emotion,
+        "confidence": row.confidence,
+        # giữ nguyên chuỗi JSON đã lưu, không parse / dump lại
+        "all_emotions": row.all_emotions,
+        "trash": row.trash,
+        "model_name": row.model_name,
+    }
+
+
+def _iter_chunks(filters: ResultFilters, archived: bool = False):
+    """
+    Server-side cursor (yield_per): mỗi lần chỉ giữ RESULTS_EXPORT_CHUNK row trong bộ nhớ.
+    archived=True: đọc từ results_archive thay vì results.
+    Yields:
+        list các row dict, theo (timestamp, id) tăng dần
+    """
+    table = results_archive_table if archived else results_table
+    c = table.c
+    columns = [c[col.name] for col in EXPORT_COLUMNS]
+    stmt = select(*columns).where(*filters.clauses(table)).order_by(c.timestamp, c.id)
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=settings.RESULTS_EXPORT_CHUNK).execute(stmt)
+        for partition in result.partitions():
+            yield [_export_row(row) for row in partition]
+
+
+def _encode_ndjson(chunks):
+    for chunk in chunks:
+        lines = []
+        for item in chunk:
+            item["timestamp"] = item["timestamp"].isoformat() if item["timestamp"] else None
+            item["all_emotions"] = json.loads(item["all_emotions"]) if item["all_emotions"] else {}
+            lines.append(json.dumps(item, ensure_ascii=False))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _encode_csv(chunks):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for chunk in chunks:
+        for item in chunk:
+            item["timestamp"] = item["timestamp"].isoformat() if item["timestamp"] else None
+            writer.writerow(item)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """File-like output chỉ ghi thêm: ParquetWriter ghi vào, generator lấy bytes ra sau mỗi row group"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("source", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("emotion", pa.string()),
+        ("confidence", pa.float64()),
+        ("all_emotions", pa.string()),
+        ("trash", pa.int32()),
+        ("model_name", pa.string()),
+    ])
+
+
+def _encode_parquet(chunks):
+    """Mỗi chunk là 1 row group, ghi ra ngay khi xong"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(pa)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+_ENCODERS = {"ndjson": _encode_ndjson, "csv": _encode_csv, "parquet": _encode_parquet}
+
+
+def check_export_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+
+async def stream_export(filters: ResultFilters, fmt: str, archived: bool = False):
+    """
+    Async generator bytes: đọc + encode từng chunk trên DB thread pool,
+    bộ nhớ không phụ thuộc kích thước bảng.
+    """
+    encoded = _ENCODERS[fmt](_iter_chunks(filters, archived))
+    try:
+        while True:
+            data = await run_db(next, encoded, None)
+            if data is None:
+                break
+            if data:
+                yield data
+    except Exception as e:
+        logger.error(f"Export ({fmt}) failed: {e}")
+        raise
+    finally:
+        await run_db(encoded.close)
@@ -15,12 +15,13 @@ class FaceService:
     def __init__(self):
         self.model = FaceModel()
         
-    async def detect_faces(self, file: UploadFile, include_cropped_base64: bool = False):
+    async def detect_faces(self, file: UploadFile, include_cropped_base64: bool = False, detector: str = None):
         """Detect all faces in uploaded image.
         
         Args:
             file: Uploaded image file
             include_cropped_base64: If True, include base64 encoded cropped faces in response
+            detector: Face detector name ("haar" | "mtcnn"), default settings.FACE_DETECTOR
             
         Returns:
             dict with faces, total_faces, image_width, image_height
@@ -33,7 +34,9 @@ class FaceService:
             image_array = await load_image_into_numpy_array(file)
             
             # Detect faces
-            result = self.model.detect_faces(image_array, include_cropped_base64=include_cropped_base64)
+            result = self.model.detect_faces(
+                image_array, include_cropped_base64=include_cropped_base64, detector=detector
+            )
             
             return {
                 "faces": result["faces"],
@@ -96,11 +99,12 @@ class FaceService:
             logger.error(f"Error predicting emotion from cropped face: {e}")
             raise HTTPException(status_code=400, detail=str(e))
             
-    async def predict_emotion(self, image_input, skip_save: bool = False):
+    async def predict_emotion(self, image_input, skip_save: bool = False, detector: str = None):
         """Predict emotion from face image.
         Args:
             image_input: Either an UploadFile or a numpy array containing the image
             skip_save: If True, skip saving result image (for realtime/performance)
+            detector: Face detector name ("haar" | "mtcnn"), default settings.FACE_DETECTOR
         """
         try:
             if isinstance(image_input, np.ndarray):
@@ -111,7 +115,7 @@ class FaceService:
                 image_array = await load_image_into_numpy_array(image_input)
 
             # Get prediction
-            result = self.model.predict(image_array)
+            result = self.model.predict(image_array, detector=detector)
 
             # Log the raw prediction result (only in debug mode)
             if logger.level <= 10:  # DEBUG level
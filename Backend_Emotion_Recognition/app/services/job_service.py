@@ -0,0 +1,163 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+
+from fastapi import UploadFile, HTTPException
+
+from app.core.config import settings
+from app.core.logger import setup_logger
+from app.core.db import create_job, update_job, get_job, claim_job, touch_job, requeue_unfinished_jobs
+from app.utils.upload_utils import spool_upload
+
+logger = setup_logger(__name__)
+
+FINISHED_STATUSES = ("done", "failed")
+
+
+class FusionJobQueue:
+    """Local worker pool chạy fusion prediction bất đồng bộ (submit / poll / stream).
+
+    Trạng thái job được lưu trong bảng `jobs`, file input lưu ở UPLOAD_DIR/jobs,
+    nên các job còn queued/running sẽ được chạy lại sau khi restart.
+
+    Nhiều uvicorn worker dùng chung bảng jobs: job được claim nguyên tử
+    (queued -> running) trước khi chạy, job running gửi heartbeat mỗi
+    FUSION_JOB_HEARTBEAT_S và chỉ bị đưa lại hàng đợi khi mất heartbeat quá
+    FUSION_JOB_LEASE_S (process chạy nó đã chết) — kiểm tra lúc start và định kỳ.
+    """
+
+    def __init__(self, handler):
+        # handler: async (file_path, filename) -> result dict
+        self.handler = handler
+        self.queue = None
+        self.workers = []
+        self.reclaimer = None
+        # job_id đang nằm trong self.queue, tránh enqueue trùng khi reclaim định kỳ
+        self._queued = set()
+        # job_id -> asyncio.Event, được set (rồi bỏ) mỗi khi status thay đổi
+        self._events = {}
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        await self._enqueue_pending()
+        self.workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(max(1, settings.FUSION_JOB_CONCURRENCY))
+        ]
+        self.reclaimer = asyncio.create_task(self._reclaim())
+        logger.info(f"Fusion job queue started with {len(self.workers)} workers")
+
+    async def stop(self):
+        tasks = self.workers + ([self.reclaimer] if self.reclaimer is not None else [])
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.reclaimer = None
+
+    def _enqueue(self, job_id: str):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self.queue.put_nowait(job_id)
+
+    async def _enqueue_pending(self):
+        """Đưa vào hàng đợi các job queued (kể cả job running đã hết lease)"""
+        try:
+            pending = await requeue_unfinished_jobs()
+        except Exception as e:
+            logger.error(f"Could not load pending fusion jobs: {e}")
+            return
+        new = [job["job_id"] for job in pending if job["job_id"] not in self._queued]
+        for job_id in new:
+            self._enqueue(job_id)
+        if new:
+            logger.info(f"Queued {len(new)} pending fusion jobs")
+
+    async def _reclaim(self):
+        while True:
+            await asyncio.sleep(settings.FUSION_JOB_LEASE_S)
+            await self._enqueue_pending()
+
+    async def submit(self, upload_file: UploadFile) -> dict:
+        """Lưu upload, tạo job 'queued' và đưa vào hàng đợi"""
+        if self.queue is None:
+            raise HTTPException(status_code=503, detail="Fusion job queue is not running")
+        if self.queue.qsize() >= settings.FUSION_JOB_QUEUE_LIMIT:
+            raise HTTPException(status_code=429, detail="Fusion job queue is full, retry later")
+
+        job_id = uuid.uuid4().hex
+        suffix = Path(upload_file.filename or "").suffix or ".mp4"
+        dest = Path(settings.UPLOAD_DIR) / "jobs" / f"{job_id}{suffix}"
+        spooled = await spool_upload(upload_file, settings.MAX_VIDEO_UPLOAD_SIZE, dest=dest)
+
+        job = await create_job(job_id, upload_file.filename, str(spooled.path))
+        if job is None:
+            spooled.cleanup()
+            raise HTTPException(status_code=500, detail="Could not create fusion job")
+
+        self._enqueue(job_id)
+        logger.info(f"Fusion job {job_id} queued ({self.queue.qsize()} in queue)")
+        return job
+
+    async def get(self, job_id: str) -> dict | None:
+        return await get_job(job_id)
+
+    async def wait_for_update(self, job_id: str, timeout: float) -> None:
+        """Chờ tới khi job đổi status hoặc hết timeout"""
+        event = self._events.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _set_status(self, job_id: str, status: str, result: dict = None, error: str = None):
+        await update_job(job_id, status, result=result, error=error)
+        self._notify(job_id)
+
+    def _notify(self, job_id: str):
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(settings.FUSION_JOB_HEARTBEAT_S)
+            try:
+                await touch_job(job_id)
+            except Exception as e:
+                logger.warning(f"Fusion job {job_id} heartbeat failed: {e}")
+
+    async def _worker(self, n: int):
+        while True:
+            job_id = await self.queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Fusion job worker {n} error on {job_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await claim_job(job_id)
+        if job is None:
+            return  # đã xong hoặc process khác đã claim
+        self._notify(job_id)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await self.handler(job["file_path"], job["filename"])
+            await self._set_status(job_id, "done", result=result)
+        except HTTPException as e:
+            await self._set_status(job_id, "failed", error=str(e.detail))
+        except Exception as e:
+            logger.error(f"Fusion job {job_id} failed: {e}")
+            await self._set_status(job_id, "failed", error=str(e))
+        finally:
+            heartbeat.cancel()
+
+        try:
+            os.remove(job["file_path"])
+        except Exception:
+            pass
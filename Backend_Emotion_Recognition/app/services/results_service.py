@@ -0,0 +1,278 @@
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List
+
+from fastapi import HTTPException
+from sqlalchemy import and_, cast, func, literal_column, or_, select, Date
+
+from app.core.config import settings
+from app.core.db import (
+    begin_write,
+    engine,
+    results_table,
+    adjust_stats,
+    bump_results_version,
+    remember_results_version,
+    run_db,
+)
+from app.core.logger import setup_logger
+from app.core.result_events import publish_ids
+
+logger = setup_logger(__name__)
+
+
+class ResultFilters:
+    """Bộ lọc dùng chung cho truy vấn results (query API, export, bulk actions)"""
+
+    def __init__(
+        self,
+        source: str | None = None,
+        trash: int | None = 0,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        emotion: str | None = None,
+    ):
+        self.source = source
+        self.trash = trash
+        self.start = _naive(start)
+        self.end = _naive(end)
+        self.emotion = emotion
+
+    def clauses(self, table=results_table) -> list:
+        """WHERE clauses; time range is half-open [start, end) so it can use the timestamp indexes.
+        `table`: results hoặc results_archive (cùng tên cột)"""
+        c = table.c
+        clauses = []
+        if self.source:
+            clauses.append(c.source == self.source)
+        if self.trash is not None:
+            clauses.append(c.trash == self.trash)
+        if self.start is not None:
+            clauses.append(c.timestamp >= self.start)
+        if self.end is not None:
+            clauses.append(c.timestamp < self.end)
+        if self.emotion:
+            clauses.append(c.emotion == self.emotion)
+        return clauses
+
+
+def _naive(dt: datetime | None) -> datetime | None:
+    """Cột timestamp không có timezone (giờ local của server): đổi datetime có tz về local"""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone().replace(tzinfo=None)
+
+
+def day_range(day: date) -> tuple:
+    """[00:00 của ngày, 00:00 ngày hôm sau)"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def encode_cursor(timestamp: datetime, result_id: int) -> str:
+    """Opaque cursor = vị trí (timestamp, id) của row cuối trang"""
+    raw = json.dumps([timestamp.isoformat(), result_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, result_id = json.loads(raw)
+        return datetime.fromisoformat(ts), int(result_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def clamp_limit(limit: int | None) -> int:
+    if limit is None:
+        return settings.RESULTS_PAGE_DEFAULT_LIMIT
+    return max(1, min(limit, settings.RESULTS_PAGE_MAX_LIMIT))
+
+
+# Cột cần cho 1 item trong list (không đọc payload)
+ITEM_COLUMNS = [
+    results_table.c.id,
+    results_table.c.source,
+    results_table.c.timestamp,
+    results_table.c.emotion,
+    results_table.c.confidence,
+    results_table.c.all_emotions,
+    results_table.c.trash,
+]
+
+
+def row_to_item(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "source": row.source,
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        "emotion": row.emotion,
+        "confidence": row.confidence,
+        "all_emotions": json.loads(row.all_emotions) if row.all_emotions else {},
+        "trash": row.trash,
+    }
+
+
+def _query_results_sync(filters: ResultFilters, limit: int, cursor: str | None = None) -> Dict[str, Any]:
+    """
+    Keyset pagination trên (timestamp DESC, id DESC): mỗi trang là 1 range scan
+    bắt đầu ngay sau row cuối của trang trước, không dùng OFFSET.
+    """
+    c = results_table.c
+    clauses = filters.clauses()
+    if cursor:
+        ts, last_id = decode_cursor(cursor)
+        clauses.append(or_(c.timestamp < ts, and_(c.timestamp == ts, c.id < last_id)))
+
+    stmt = (
+        select(*ITEM_COLUMNS)
+        .where(*clauses)
+        .order_by(c.timestamp.desc(), c.id.desc())
+        .limit(limit + 1)
+    )
+    with engine.begin() as conn:
+        rows = conn.execute(stmt).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items: List[Dict[str, Any]] = []
+    for row in rows:
+        try:
+            items.append(row_to_item(row))
+        except Exception as e:
+            logger.warning(f"Error parsing result row {row.id}: {e}")
+
+    next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+    return {"results": items, "count": len(items), "next_cursor": next_cursor}
+
+
+def changed_ids(conn, where) -> list:
+    """Id các row khớp `where` cho event live feed (tối đa RESULTS_EVENTS_MAX_IDS + 1)"""
+    stmt = select(results_table.c.id).where(where).limit(settings.RESULTS_EVENTS_MAX_IDS + 1)
+    return list(conn.execute(stmt).scalars())
+
+
+def set_trash_where_sync(where, trash: int) -> int:
+    """
+    1 câu UPDATE set-based cho mọi result khớp `where` (chỉ row thực sự đổi trash),
+    results_stats cập nhật trong cùng transaction; event trash / restore gửi sau commit.
+    Returns:
+        số row bị thay đổi
+    """
+    c = results_table.c
+    changing = and_(where, c.trash != trash)
+    version_info = None
+    with begin_write() as conn:
+        ids = changed_ids(conn, changing)
+        adjust_stats(conn, changing, -1)
+        adjust_stats(conn, changing, +1, trash=trash)
+        affected = conn.execute(results_table.update().where(changing).values(trash=trash)).rowcount
+        if affected:
+            version_info = bump_results_version(conn)
+    remember_results_version(version_info)
+    publish_ids("trash" if trash else "restore", ids, affected)
+    return affected
+
+
+def delete_where_sync(where) -> int:
+    """1 câu DELETE set-based + cập nhật results_stats cùng transaction. Returns: số row bị xóa"""
+    version_info = None
+    with begin_write() as conn:
+        ids = changed_ids(conn, where)
+        adjust_stats(conn, where, -1)
+        affected = conn.execute(results_table.delete().where(where)).rowcount
+        if affected:
+            version_info = bump_results_version(conn)
+    remember_results_version(version_info)
+    publish_ids("delete", ids, affected)
+    return affected
+
+
+async def query_page(filters: ResultFilters, limit: int | None = None, cursor: str | None = None) -> Dict[str, Any]:
+    """Async wrapper: 1 trang kết quả, chạy trên DB thread pool"""
+    return await run_db(_query_results_sync, filters, clamp_limit(limit), cursor)
+
+
+# ------------------------------------------------------------------ #
+# Timeline: count + mean confidence theo (bucket thời gian, emotion), tính trong SQL
+# ------------------------------------------------------------------ #
+TIMELINE_BUCKETS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+_SQLITE_BUCKET_FORMATS = {"minute": "%Y-%m-%dT%H:%M:00", "hour": "%Y-%m-%dT%H:00:00", "day": "%Y-%m-%d"}
+
+
+def _bucket_expr(col, bucket: str):
+    """Đầu bucket chứa `col`. Chỉ dùng literal (không bound param) để SELECT và
+    GROUP BY là cùng 1 biểu thức trên SQL Server."""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        return func.strftime(literal_column(f"'{_SQLITE_BUCKET_FORMATS[bucket]}'"), col)
+    if bucket == "day":
+        return cast(col, Date)
+    if dialect == "mssql":
+        unit = literal_column(bucket)
+        zero = literal_column("0")
+        return func.dateadd(unit, func.datediff(unit, zero, col), zero)
+    return func.date_trunc(literal_column(f"'{bucket}'"), col)
+
+
+def _timeline_sync(filters: ResultFilters, bucket: str) -> Dict[str, Any]:
+    c = results_table.c
+    b = _bucket_expr(c.timestamp, bucket)
+    stmt = (
+        select(
+            b.label("bucket"),
+            c.emotion,
+            func.count().label("count"),
+            func.avg(c.confidence).label("mean_confidence"),
+        )
+        .where(*filters.clauses(), c.emotion.is_not(None))
+        .group_by(b, c.emotion)
+        .order_by(b)
+    )
+    with engine.begin() as conn:
+        rows = conn.execute(stmt).fetchall()
+
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        key = row.bucket.isoformat() if hasattr(row.bucket, "isoformat") else str(row.bucket)
+        entry = buckets.setdefault(key, {"time": key, "count": 0, "emotions": {}})
+        entry["count"] += int(row.count)
+        entry["emotions"][row.emotion] = {
+            "count": int(row.count),
+            "mean_confidence": float(row.mean_confidence) if row.mean_confidence is not None else None,
+        }
+    return {
+        "bucket": bucket,
+        "start": filters.start.isoformat() if filters.start else None,
+        "end": filters.end.isoformat() if filters.end else None,
+        "timeline": list(buckets.values()),
+    }
+
+
+async def query_timeline(filters: ResultFilters, bucket: str) -> Dict[str, Any]:
+    if bucket not in TIMELINE_BUCKETS:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid bucket. Must be one of: {', '.join(TIMELINE_BUCKETS)}"
+        )
+    # Thiếu cận nào thì lấy RESULTS_TIMELINE_MAX_BUCKETS bucket tính từ cận còn lại (hoặc tới hiện tại),
+    # không bao giờ GROUP BY toàn bộ lịch sử
+    span = TIMELINE_BUCKETS[bucket] * settings.RESULTS_TIMELINE_MAX_BUCKETS
+    if filters.start is None or filters.end is None:
+        end = filters.end
+        if end is None:
+            end = filters.start + span if filters.start is not None else datetime.now()
+        start = filters.start if filters.start is not None else end - span
+        filters = ResultFilters(
+            source=filters.source, trash=filters.trash, start=start, end=end, emotion=filters.emotion
+        )
+    else:
+        n = (filters.end - filters.start) / TIMELINE_BUCKETS[bucket]
+        if n > settings.RESULTS_TIMELINE_MAX_BUCKETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Range spans {int(n)} {bucket} buckets (max {settings.RESULTS_TIMELINE_MAX_BUCKETS})",
+            )
+    return await run_db(_timeline_sync, filters, bucket)
@@ -1,4 +1,5 @@
 import os
+import time
 from pathlib import Path
 import shutil
 
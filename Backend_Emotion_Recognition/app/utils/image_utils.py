@@ -2,8 +2,8 @@ from fastapi import HTTPException, UploadFile
 import cv2
 import numpy as np
 from app.core.config import settings
-import aiofiles
 from pathlib import Path
+from app.utils.upload_utils import spool_upload
 
 async def validate_image(file: UploadFile):
     """Validate uploaded image file"""
@@ -19,19 +19,11 @@ async def validate_image(file: UploadFile):
             detail=f"File size too large. Maximum size: {settings.MAX_UPLOAD_SIZE/1024/1024}MB"
         )
 
-async def save_upload_file(upload_file: UploadFile, folder: str) -> Path:
-    """Save uploaded file and return the path"""
-    try:
-        file_path = Path(settings.UPLOAD_DIR) / folder / upload_file.filename
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await upload_file.read()
-            await f.write(content)
-            
-        return file_path
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
+async def save_upload_file(upload_file: UploadFile, folder: str, max_size: int = None) -> Path:
+    """Save uploaded file (streamed in chunks) and return the path"""
+    file_path = Path(settings.UPLOAD_DIR) / folder / upload_file.filename
+    saved = await spool_upload(upload_file, max_size or settings.MAX_UPLOAD_SIZE, dest=file_path)
+    return saved.path
 
 async def load_image_into_numpy_array(file: UploadFile):
     """Load image from UploadFile into numpy array"""
@@ -0,0 +1,146 @@
+import json
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:  # orjson là optional, fallback về json chuẩn
+    orjson = None
+    ORJSONResponse = None
+
+# Default response class của app: orjson nếu có
+FastJSONResponse = ORJSONResponse or JSONResponse
+
+MEDIA_JSON = "application/json"
+MEDIA_MSGPACK = "application/msgpack"
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+
+# media type (Accept) -> format
+RESPONSE_FORMATS = {
+    MEDIA_JSON: "json",
+    MEDIA_MSGPACK: "msgpack",
+    "application/x-msgpack": "msgpack",
+    MEDIA_ARROW: "arrow",
+}
+FORMAT_MEDIA_TYPES = {"json": MEDIA_JSON, "msgpack": MEDIA_MSGPACK, "arrow": MEDIA_ARROW}
+
+# Thứ tự cột xác suất trong layout columnar; emotion khác gặp trong dữ liệu được thêm vào cuối
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
+
+# Key chứa list result trong response của các endpoint /results/*
+ITEM_LIST_KEYS = ("results", "all_results", "trash_results")
+
+
+def dumps_json(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False).encode("utf-8")
+
+
+def _format_available(fmt: str) -> bool:
+    try:
+        if fmt == "msgpack":
+            import msgpack  # noqa: F401
+        elif fmt == "arrow":
+            import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate_format(accept: str | None) -> str | None:
+    """
+    Chọn format theo header Accept (theo q-value, bỏ format thiếu thư viện).
+    Returns:
+        "json" | "msgpack" | "arrow", None = không format nào chấp nhận được (406)
+    """
+    if not accept:
+        return "json"
+    ranges = []
+    for i, part in enumerate(accept.split(",")):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranges.append((-q, i, media.lower()))
+    for _, _, media in sorted(ranges):
+        if media in ("*/*", "application/*"):
+            return "json"
+        fmt = RESPONSE_FORMATS.get(media)
+        if fmt and _format_available(fmt):
+            return fmt
+    return None
+
+
+def to_columnar(items: list) -> dict:
+    """
+    List item (dict) -> mảng song song theo cột; all_emotions thành
+    `labels` cố định + ma trận `probabilities` (null nếu item không có label đó).
+    """
+    labels = list(EMOTION_LABELS)
+    for item in items:
+        for label in item.get("all_emotions") or {}:
+            if label not in labels:
+                labels.append(label)
+    keys = [k for k in (items[0] if items else {}) if k != "all_emotions"]
+    columns = {k: [item.get(k) for item in items] for k in keys}
+    probabilities = [
+        [(item.get("all_emotions") or {}).get(label) for label in labels] for item in items
+    ]
+    return {"columns": columns, "labels": labels, "probabilities": probabilities}
+
+
+def columnar_content(content: dict) -> tuple:
+    """
+    Đổi list result trong response sang layout columnar.
+    Returns:
+        (content mới, key của list) — key None nếu response không có list result
+    """
+    for key in ITEM_LIST_KEYS:
+        if isinstance(content.get(key), list):
+            return {**content, key: to_columnar(content[key])}, key
+    return content, None
+
+
+def _encode_arrow(content: dict, list_key: str) -> bytes:
+    """Arrow IPC stream: 1 record batch các cột + `probabilities` (list<float64>);
+    labels và các field còn lại của response nằm trong schema metadata"""
+    import pyarrow as pa
+
+    table = content[list_key]
+    arrays, names = [], []
+    for name, values in table["columns"].items():
+        if name == "timestamp":
+            values = [datetime.fromisoformat(v) if v else None for v in values]
+            arrays.append(pa.array(values, type=pa.timestamp("us")))
+        else:
+            arrays.append(pa.array(values))
+        names.append(name)
+    arrays.append(pa.array(table["probabilities"], type=pa.list_(pa.float64())))
+    names.append("probabilities")
+
+    extra = {k: v for k, v in content.items() if k != list_key}
+    metadata = {"labels": json.dumps(table["labels"]), "response": json.dumps(extra)}
+    batch = pa.RecordBatch.from_arrays(arrays, names=names)
+    schema = batch.schema.with_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch.replace_schema_metadata(metadata))
+    return sink.getvalue().to_pybytes()
+
+
+def encode_content(content: dict, fmt: str, list_key: str | None = None) -> bytes:
+    if fmt == "msgpack":
+        import msgpack
+
+        return msgpack.packb(content, use_bin_type=True)
+    if fmt == "arrow":
+        return _encode_arrow(content, list_key)
+    return dumps_json(content)
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+
+class SpooledUpload:
+    """An upload streamed to disk, with its size and content hash"""
+
+    def __init__(self, path: Path, size: int, sha256: str, filename: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+    def cleanup(self):
+        """Remove the spooled file (ignore errors)"""
+        _remove_quietly(self.path)
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File size too large. Maximum size: {max_size/1024/1024:.0f}MB"
+    )
+
+
+async def spool_upload(
+    upload_file: UploadFile,
+    max_size: int,
+    dest: Optional[Path] = None,
+    suffix: Optional[str] = None,
+) -> SpooledUpload:
+    """Copy an upload to disk in chunks, enforcing max_size and hashing on the way.
+
+    Writes to `dest` if given, otherwise to a temp file (caller must `cleanup()`).
+    Raises HTTPException(413) if the file is larger than max_size.
+
+    Note: by the time this runs Starlette has already parsed the multipart body into
+    its own SpooledTemporaryFile, so an accepted upload is written to disk twice and
+    this check alone does not stop an oversized body from being received.
+    UploadSizeLimitMiddleware rejects oversized requests before the body is parsed.
+    """
+    if upload_file.size is not None and upload_file.size > max_size:
+        raise _too_large(max_size)
+
+    if dest is None:
+        if suffix is None:
+            suffix = Path(upload_file.filename or "").suffix
+        fd, tmp_name = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        path = Path(tmp_name)
+    else:
+        path = Path(dest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            while True:
+                chunk = await upload_file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise _too_large(max_size)
+                hasher.update(chunk)
+                await f.write(chunk)
+    except HTTPException:
+        _remove_quietly(path)
+        raise
+    except Exception as e:
+        _remove_quietly(path)
+        raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
+
+    return SpooledUpload(path, size, hasher.hexdigest(), upload_file.filename)
+
+
+def _remove_quietly(path: Path):
+    try:
+        os.remove(path)
+    except Exception:
+        pass
+
+
+def _body_limit(path: str) -> Optional[int]:
+    """Max request body for single-file upload routes (None = not limited here)"""
+    if path.startswith("/audio-video/"):
+        limit = settings.MAX_VIDEO_UPLOAD_SIZE
+    elif path.startswith("/audio/"):
+        limit = settings.MAX_AUDIO_UPLOAD_SIZE
+    elif path in ("/face/detect", "/face/predict"):
+        limit = settings.MAX_UPLOAD_SIZE
+    else:
+        return None
+    return limit + settings.UPLOAD_FORM_OVERHEAD
+
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized multipart uploads before Starlette parses (and spools) the body.
+
+    A Content-Length above the route limit gets 413 without reading the body; chunked
+    bodies are counted while they are received and aborted with 413 once over the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        limit = _body_limit(scope["path"])
+        if limit is None or not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": _too_large(limit - settings.UPLOAD_FORM_OVERHEAD).detail})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while FastAPI parses the form -> handled as a normal 413
+                    raise _too_large(limit - settings.UPLOAD_FORM_OVERHEAD)
+            return message
+
+        await self.app(scope, limited_receive, send)
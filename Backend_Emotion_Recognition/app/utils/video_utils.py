@@ -1,7 +1,22 @@
+import asyncio
+import json
 import subprocess
-from pathlib import Path
+from functools import lru_cache
 from typing import Optional
 
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# Re-encode settings used when the source streams cannot be stream-copied
+REENCODE_ARGS = ["-c:v", "libx264", "-preset", "fast", "-crf", "23", "-c:a", "aac", "-b:a", "128k"]
+# Codecs an MP4 container (and browsers) can play as-is
+MP4_COPY_VIDEO_CODECS = {"h264"}
+MP4_COPY_AUDIO_CODECS = {"aac", "mp3"}
+
+# Caps concurrent ffmpeg processes across requests
+_ffmpeg_slots = asyncio.Semaphore(settings.FFMPEG_MAX_CONCURRENCY)
+
 
 def convert_flv_to_mp4(input_path: str, output_path: str, timeout: int = 60) -> None:
     """Convert an input video (FLV or other) to MP4 using ffmpeg.
@@ -36,10 +51,120 @@ def convert_flv_to_mp4(input_path: str, output_path: str, timeout: int = 60) ->
         raise RuntimeError(f"FFmpeg conversion failed: {result.stderr}")
 
 
+@lru_cache(maxsize=1)
 def is_ffmpeg_available() -> bool:
-    """Return True if ffmpeg is available on PATH."""
+    """Return True if ffmpeg is available on PATH (probed once per process)."""
     try:
         r = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, timeout=5)
         return r.returncode == 0
     except Exception:
         return False
+
+
+def probe_duration(input_path: str, timeout: int = 10) -> Optional[float]:
+    """Return the container duration in seconds using ffprobe, or None if unknown."""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        str(input_path),
+    ]
+    try:
+        r = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if r.returncode != 0:
+            return None
+        return float(r.stdout.strip())
+    except Exception:
+        return None
+
+
+def probe_codecs(input_path: str, timeout: int = 10) -> dict:
+    """Return {"video": codec_name | None, "audio": codec_name | None} using ffprobe."""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "stream=codec_type,codec_name",
+        "-of",
+        "json",
+        str(input_path),
+    ]
+    codecs = {"video": None, "audio": None}
+    try:
+        r = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if r.returncode != 0:
+            return codecs
+        for stream in json.loads(r.stdout).get("streams", []):
+            kind = stream.get("codec_type")
+            if kind in codecs and codecs[kind] is None:
+                codecs[kind] = stream.get("codec_name")
+    except Exception:
+        pass
+    return codecs
+
+
+def can_stream_copy(codecs: dict) -> bool:
+    """True if the streams can be remuxed into MP4 without re-encoding."""
+    return codecs["video"] in MP4_COPY_VIDEO_CODECS and (
+        codecs["audio"] is None or codecs["audio"] in MP4_COPY_AUDIO_CODECS
+    )
+
+
+async def _run_ffmpeg(cmd: list, timeout: int) -> tuple:
+    """Run ffmpeg as an async subprocess; returns (returncode, stderr)."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+    except NotImplementedError:
+        # Event loops without subprocess support (e.g. Windows selector loop)
+        r = await run_in_threadpool(
+            subprocess.run, cmd, capture_output=True, text=True, timeout=timeout
+        )
+        return r.returncode, r.stderr
+
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise RuntimeError(f"FFmpeg timed out after {timeout}s")
+    return proc.returncode, stderr.decode(errors="replace")
+
+
+async def convert_to_mp4_async(input_path: str, output_path: str, timeout: int = 60) -> str:
+    """Convert/remux a video to MP4 without blocking the event loop.
+
+    Uses a stream-copy remux when the source is already H.264 (+AAC/MP3),
+    otherwise re-encodes with libx264/AAC. At most FFMPEG_MAX_CONCURRENCY
+    ffmpeg processes run at once. Returns "copy" or "reencode".
+    Raises RuntimeError on failure.
+    """
+    codecs = await run_in_threadpool(probe_codecs, input_path)
+    mode = "copy" if can_stream_copy(codecs) else "reencode"
+    codec_args = ["-c", "copy"] if mode == "copy" else REENCODE_ARGS
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-v",
+        "error",
+        "-i",
+        str(input_path),
+        *codec_args,
+        "-movflags",
+        "+faststart",
+        "-f",
+        "mp4",
+        str(output_path),
+    ]
+    async with _ffmpeg_slots:
+        returncode, stderr = await _run_ffmpeg(cmd, timeout)
+    if returncode != 0:
+        raise RuntimeError(f"FFmpeg conversion failed: {stderr}")
+    return mode
@@ -0,0 +1,32 @@
+"""Move old results (and optionally all trashed results) into results_archive.
+
+Usage (from Backend_Emotion_Recognition/):
+    python -m scripts.archive_results [--days N] [--trash]
+
+Rows are moved in batches of RESULTS_ARCHIVE_BATCH, one short transaction each,
+so the job can run while the API is serving. Archived rows are read back with
+/results/export?archived=true.
+"""
+import argparse
+
+from app.core.config import settings
+from app.core.db import results_table
+from app.services.archive_service import archive_old_sync, archive_where_sync
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=settings.RESULTS_ARCHIVE_AFTER_DAYS,
+                        help="archive results older than this many days (0 = skip)")
+    parser.add_argument("--trash", action="store_true", help="also archive every trashed result")
+    args = parser.parse_args()
+
+    old = archive_old_sync(args.days)
+    print(f"results_archive: {old} rows older than {args.days} days")
+    if args.trash:
+        trashed = archive_where_sync(results_table.c.trash == 1)
+        print(f"results_archive: {trashed} trashed rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark face detectors on the bundled sample media: per-image latency and agreement.
+
+Usage (from Backend_Emotion_Recognition/):
+    python -m scripts.benchmark_face_detectors --frames 16
+    python -m scripts.benchmark_face_detectors --detectors haar@1.0,haar@0.5,mtcnn@0.5
+
+Each detector is given as name@scale. Agreement is measured against --reference:
+an image agrees if both find no face, or their top boxes overlap with IoU >= --iou.
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.models.face_detectors import get_face_detector
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+VIDEO_EXTS = {".webm", ".mp4", ".avi", ".mov"}
+
+
+def _load_media(media_dir: Path, frames_per_video: int) -> list:
+    """Load sample images and uniformly sampled video frames as (name, RGB array)"""
+    samples = []
+    for path in sorted(media_dir.iterdir()):
+        ext = path.suffix.lower()
+        if ext in IMAGE_EXTS:
+            img = cv2.imread(str(path))
+            if img is not None:
+                samples.append((path.name, cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
+        elif ext in VIDEO_EXTS:
+            cap = cv2.VideoCapture(str(path))
+            frames = []
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                frames.append(frame)
+            cap.release()
+            if not frames:
+                continue
+            idx = np.linspace(0, len(frames) - 1, min(frames_per_video, len(frames))).astype(int)
+            for i in idx:
+                samples.append((f"{path.name}#{i}", cv2.cvtColor(frames[i], cv2.COLOR_BGR2RGB)))
+    return samples
+
+
+def _iou(a, b) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _run(spec: str, samples: list, warmup: int):
+    name, _, scale = spec.partition("@")
+    detector = get_face_detector(name)
+    scale = float(scale) if scale else 1.0
+    for _, img in samples[:warmup]:
+        detector.detect(img, scale=scale)
+
+    times, boxes = [], []
+    for _, img in samples:
+        t0 = time.perf_counter()
+        found = detector.detect(img, scale=scale)
+        times.append((time.perf_counter() - t0) * 1000)
+        boxes.append(found[0] if found else None)
+    return times, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--media-dir",
+        type=Path,
+        default=settings.BASE_DIR.parent / "export_video_audio",
+    )
+    parser.add_argument("--frames", type=int, default=16, help="Frames sampled per video")
+    parser.add_argument("--detectors", default="haar@1.0,haar@0.5,mtcnn@1.0,mtcnn@0.5")
+    parser.add_argument("--reference", default="mtcnn@1.0")
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--warmup", type=int, default=2)
+    args = parser.parse_args()
+
+    samples = _load_media(args.media_dir, args.frames)
+    if not samples:
+        raise SystemExit(f"No sample images/videos found in {args.media_dir}")
+    print(f"{len(samples)} images from {args.media_dir}")
+
+    specs = args.detectors.split(",")
+    if args.reference not in specs:
+        specs.insert(0, args.reference)
+    results = {spec: _run(spec, samples, args.warmup) for spec in specs}
+    _, ref_boxes = results[args.reference]
+
+    for spec in specs:
+        times, boxes = results[spec]
+        times_sorted = sorted(times)
+        p90 = times_sorted[int(0.9 * (len(times_sorted) - 1))]
+        detected = sum(b is not None for b in boxes)
+        agree = sum(
+            (a is None and b is None)
+            or (a is not None and b is not None and _iou(a, b) >= args.iou)
+            for a, b in zip(boxes, ref_boxes)
+        )
+        print(
+            f"{spec:<12} mean={statistics.mean(times):7.1f}ms  "
+            f"p50={statistics.median(times):7.1f}ms  p90={p90:7.1f}ms  "
+            f"faces={detected}/{len(samples)}  agreement={agree / len(samples):.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark AVEmotionNet inference: eager baseline vs optimized CPU execution.
+
+Usage (from Backend_Emotion_Recognition/):
+    python -m scripts.benchmark_fusion --runs 20
+
+Optimized path follows the FUSION_* settings (override them via .env / env vars).
+"""
+import argparse
+import statistics
+import time
+
+import torch
+
+from app.core.config import settings
+from app.models.audio_video_model import AudioVideoModel
+
+
+def _bench(fn, runs: int, warmup: int) -> list:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def _report(name: str, times: list):
+    times = sorted(times)
+    p90 = times[int(0.9 * (len(times) - 1))]
+    print(
+        f"{name:<10} mean={statistics.mean(times):8.1f}ms  "
+        f"p50={statistics.median(times):8.1f}ms  p90={p90:8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+
+    video = torch.randn(1, 16, 3, 224, 224)
+    audio = torch.randn(1, 1, 80, 320)
+
+    # Benchmark always builds from the checkpoint, not a prebuilt artifact
+    settings.FUSION_ARTIFACT_PATH = None
+    wrapper = AudioVideoModel(optimize=False)
+    dedup = wrapper.model.video_enc.dedup
+    wrapper.model.video_enc.dedup = False
+
+    def baseline():
+        with torch.no_grad():
+            return wrapper.model(video, audio)
+
+    base_times = _bench(baseline, args.runs, args.warmup)
+    base_out = baseline()
+
+    wrapper.model.video_enc.dedup = dedup
+    wrapper.optimize()
+    optimized_times = _bench(lambda: wrapper.predict(video, audio), args.runs, args.warmup)
+    with wrapper._grad_context(), wrapper._autocast():
+        opt_out = wrapper.runner(video, audio).float()
+
+    print(
+        f"settings: graph={settings.FUSION_GRAPH_MODE} channels_last={settings.FUSION_CHANNELS_LAST} "
+        f"inference_mode={settings.FUSION_INFERENCE_MODE} bf16={wrapper.use_bf16} "
+        f"dedup={dedup} threads={torch.get_num_threads()}"
+    )
+    _report("baseline", base_times)
+    _report("optimized", optimized_times)
+    print(f"speedup: {statistics.median(base_times) / statistics.median(optimized_times):.2f}x")
+    print(f"max |logit diff|: {(base_out - opt_out).abs().max().item():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Export AVEmotionNet as a traced + frozen TorchScript artifact for fast startup.
+
+Usage (from Backend_Emotion_Recognition/):
+    python -m scripts.export_fusion_model [--output models/fusion_video_audio/best_fusion.ts.pt]
+
+When the artifact exists at FUSION_ARTIFACT_PATH, AudioVideoModel loads it with
+torch.jit.load instead of building the network and tracing at startup.
+The artifact stores the checkpoint fingerprint; if best_fusion.pth (or FUSION_CHANNELS_LAST /
+FUSION_BF16) changes, the stale artifact is ignored with a warning until it is re-exported.
+"""
+import argparse
+from pathlib import Path
+
+import torch
+
+from app.core.config import settings
+from app.models.audio_video_model import ARTIFACT_FINGERPRINT_KEY, AudioVideoModel, artifact_fingerprint
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", type=Path, default=settings.FUSION_ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    # Build from the checkpoint and trace the whole network (dedup cannot be traced)
+    settings.FUSION_ARTIFACT_PATH = None
+    settings.FUSION_GRAPH_MODE = "trace"
+    settings.FUSION_FRAME_DEDUP = False
+    wrapper = AudioVideoModel()
+    if not isinstance(wrapper.runner, torch.jit.ScriptModule):
+        raise SystemExit("TorchScript trace failed, see log for details")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    torch.jit.save(
+        wrapper.runner,
+        str(args.output),
+        _extra_files={ARTIFACT_FINGERPRINT_KEY: artifact_fingerprint(wrapper.model_path)},
+    )
+    print(f"Saved TorchScript artifact to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Migrate the `results` table: add denormalized columns + indexes, backfill from payload.
+
+Usage (from Backend_Emotion_Recognition/):
+    python -m scripts.migrate_db
+
+Safe to re-run; only rows whose `emotion` column is still NULL are backfilled.
+"""
+from app.core.db import migrate_results_columns, rebuild_stats
+
+
+def main():
+    backfilled = migrate_results_columns(backfill=True)
+    print(f"results: {backfilled} rows backfilled")
+    if backfilled:
+        rebuild_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Rebuild the results_stats aggregates table from the results table.
+
+Usage (from Backend_Emotion_Recognition/):
+    python -m scripts.rebuild_stats
+
+Run after editing `results` outside the API (manual SQL, restores from backup).
+"""
+from app.core.db import rebuild_stats
+
+
+def main():
+    buckets = rebuild_stats()
+    print(f"results_stats: {buckets} buckets")
+
+
+if __name__ == "__main__":
+    main()